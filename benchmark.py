@@ -0,0 +1,685 @@
+"""Benchmarks for the download pipeline.
+
+    python benchmark.py progress [--workers 3] [--events 2000] [--duration 2]
+    python benchmark.py concurrency [--jobs 40] [--workers 1 2 4 8] [--rate 524288] [--max-connections 6]
+    python benchmark.py sessions [--jobs 100] [--workers 3] [--size 65536]
+    python benchmark.py segmented [--jobs 4] [--segments 1 2 4 8] [--rate 1048576]
+    python benchmark.py bandwidth [--cap 4194304] [--tracks 8]
+    python benchmark.py load [--sizes 10 1000 10000] [--workers 4] [--size 16384]
+    python benchmark.py spotify [--albums 5] [--tracks 40] [--delay 0.1]
+    python benchmark.py tagging [--albums 4] [--album-size 12] [--workers 4]
+    python benchmark.py jobs [--items 10000]
+    python benchmark.py interrupt [--size 67108864] [--rate 1048576] [--after 2]
+
+All but the progress and tagging scenarios need yt-dlp; they download
+from a local FakeMediaServer, never from the internet. The load scenario
+also stubs out Spotify (FakeSpotify) and the YouTube search. The tagging
+scenario needs FFmpeg instead.
+"""
+import os
+import sys
+import time
+import shutil
+import signal
+import argparse
+import tempfile
+import subprocess
+import threading
+import functools
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+from concurrent.futures import ThreadPoolExecutor
+
+import jobstore
+from engine import DownloadEngine, ProgressTable, RowWindow, Job, COMPLETED
+from jobstore import JobStore
+from resolver import Resolver
+from cache import DiskCache
+from metadata import MetadataStore
+from spotify import SpotifyCatalogue, iter_spotify_tracks
+from tagging import ArtworkCache, spotify_tags
+from postprocess import run_ffmpeg
+from history import HistoryManager
+from fakeserver import FakeMediaServer, FakeSpotify
+
+class CountingTree:
+    # Stands in for ttk.Treeview, counting the calls the UI would make
+    def __init__(self):
+        self.rows = {}
+        self.reads = 0
+        self.writes = 0
+
+    def insert(self, iid, values):
+        self.rows[iid] = tuple(values)
+        self.writes += 1
+
+    def exists(self, iid):
+        return iid in self.rows
+
+    def item(self, iid, values=None):
+        if values is None:
+            self.reads += 1
+            return {'values': self.rows.get(iid, ())}
+        self.rows[iid] = tuple(values)
+        self.writes += 1
+
+    # Row callbacks for engine.RowWindow, like DownloaderApp's
+
+    def insert_row(self, job, values):
+        self.insert(job.id, values)
+
+    def update_row(self, job_id, values):
+        self.item(job_id, values=values)
+
+    def delete_row(self, job_id):
+        self.rows.pop(job_id, None)
+        self.writes += 1
+
+class CountingRoot:
+    # Stands in for tk.Tk: after() only queues, the benchmark drains the queue
+    def __init__(self):
+        self.callbacks = []
+        self.scheduled = 0
+        self._lock = threading.Lock()
+
+    def after(self, ms, func):
+        with self._lock:
+            self.callbacks.append(func)
+            self.scheduled += 1
+
+    def run_pending(self):
+        with self._lock:
+            callbacks, self.callbacks = self.callbacks, []
+        for func in callbacks:
+            func()
+
+def make_engine(**kwargs):
+    # Engine with in-memory stores, so benchmarks leave nothing on disk
+    kwargs.setdefault("history_manager", HistoryManager(":memory:", legacy_file=None))
+    kwargs.setdefault("config", {"quiet": True})
+    # The fake media files aren't real audio, there's nothing to tag
+    kwargs["config"].setdefault("embed_metadata", False)
+    kwargs.setdefault("job_store", JobStore(":memory:"))
+    kwargs.setdefault("resolver", Resolver(cache=DiskCache("query_cache", db_path=":memory:")))
+    kwargs.setdefault("metadata", MetadataStore(cache=DiskCache("info_cache", db_path=":memory:")))
+    if "catalogue" not in kwargs:
+        kwargs["catalogue"] = SpotifyCatalogue(public=kwargs.pop("spotify", None),
+                                               cache=DiskCache("spotify_catalogue", db_path=":memory:"))
+    return DownloadEngine(**kwargs)
+
+def rss_bytes():
+    # Resident memory of this process, None where it can't be read cheaply
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # Peak only, not current
+    return peak if sys.platform == "darwin" else peak * 1024
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+class UiLoop:
+    # Stands in for the Tk main loop running DownloaderApp.ui_tick: every
+    # tick_ms it drains the ProgressTable through a RowWindow into a
+    # CountingTree. Records how
+    # late each tick fires (the GIL is shared with the workers) and how
+    # long its work takes, and samples memory while it is at it.
+    def __init__(self, table, tick_ms=100):
+        self.table = table
+        self.tick = tick_ms / 1000.0
+        self.tree = CountingTree()
+        self.window = RowWindow(self.tree)
+        self.late = []
+        self.work = []
+        self.peak_rss = rss_bytes()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        due = time.monotonic() + self.tick
+        while not self._stop.wait(max(0.0, due - time.monotonic())):
+            began = time.monotonic()
+            self.late.append(began - due)
+            self.window.apply(*self.table.drain())
+            rss = rss_bytes()
+            if rss and rss > (self.peak_rss or 0):
+                self.peak_rss = rss
+            self.work.append(time.monotonic() - began)
+            # Like root.after(): the next tick is scheduled once this one is done
+            due = time.monotonic() + self.tick
+
+def simulate_hooks(engine, jobs, events_per_job, duration):
+    # One thread per job firing yt-dlp style 'downloading' callbacks
+    def worker(job):
+        delay = duration / events_per_job
+        for i in range(events_per_job):
+            pct = (i + 1) * 100.0 / events_per_job
+            engine.progress_hook(job, {'status': 'downloading', '_percent_str': f"{pct:5.1f}%",
+                                       '_speed_str': f"{1 + i % 7}.00MiB/s"})
+            time.sleep(delay)
+        engine.progress_hook(job, {'status': 'finished'})
+
+    threads = [threading.Thread(target=worker, args=(job,)) for job in jobs]
+    for t in threads:
+        t.start()
+    return threads
+
+def bench_progress(workers, events_per_job, duration, tick_ms=100):
+    results = {}
+
+    # Before: every hook call schedules root.after(0, ...) and the callback
+    # does a read-modify-write of the row (the pre-ProgressTable GUI path)
+    engine = make_engine()
+    root, tree = CountingRoot(), CountingTree()
+    jobs = [Job(str(i), f"job{i}", "mp3", "") for i in range(workers)]
+    for job in jobs:
+        tree.insert(job.id, job.values())
+
+    def legacy_listener(event, job, changes):
+        def apply():
+            values = list(tree.item(job.id)['values'])
+            if 'progress' in changes: values[3] = changes['progress']
+            if 'status' in changes: values[4] = changes['status']
+            if 'speed' in changes: values[5] = changes['speed']
+            tree.item(job.id, values=values)
+        root.after(0, apply)
+
+    engine.subscribe(legacy_listener)
+    threads = simulate_hooks(engine, jobs, events_per_job, duration)
+    while any(t.is_alive() for t in threads):
+        root.run_pending()
+        time.sleep(0.001)
+    root.run_pending()
+    results["before"] = (root.scheduled, tree.reads, tree.writes - workers)
+
+    # After: workers write into a ProgressTable, one tick per tick_ms
+    # applies only rows whose values actually changed
+    engine = make_engine()
+    table = ProgressTable()
+    engine.subscribe(table.push)
+    tree = CountingTree()
+    jobs = [Job(str(i), f"job{i}", "mp3", "") for i in range(workers)]
+    for job in jobs:
+        tree.insert(job.id, job.values())
+    ticks = 0
+
+    def tick():
+        events, dirty = table.drain()
+        for job in dirty:
+            values = job.values()
+            if tree.rows.get(job.id) != values:
+                tree.item(job.id, values=values)
+
+    threads = simulate_hooks(engine, jobs, events_per_job, duration)
+    while any(t.is_alive() for t in threads):
+        tick()
+        ticks += 1
+        time.sleep(tick_ms / 1000.0)
+    tick()
+    ticks += 1
+    results["after"] = (ticks, tree.reads, tree.writes - workers)
+
+    hook_calls = workers * (events_per_job + 1)
+    print(f"{workers} workers x {events_per_job} progress events over ~{duration}s "
+          f"({hook_calls} hook calls)")
+    print(f"{'':8}{'UI callbacks':>14}{'row reads':>12}{'row writes':>12}")
+    for name in ("before", "after"):
+        callbacks, reads, writes = results[name]
+        print(f"{name:8}{callbacks:>14}{reads:>12}{writes:>12}")
+    return results
+
+def run_batch(engine, urls, fmt="mp4", folder_name="bench"):
+    # Queue urls, wait for the engine to drain, return (elapsed, completed, failed)
+    counts = {"completed": 0, "failed": 0}
+
+    def on_event(event, job, changes):
+        if event in counts:
+            counts[event] += 1
+
+    engine.subscribe(on_event)
+    start = time.monotonic()
+    for url in urls:
+        engine.add_video(url, fmt, folder_name)
+    engine.wait()
+    elapsed = time.monotonic() - start
+    engine.unsubscribe(on_event)
+    return elapsed, counts["completed"], counts["failed"]
+
+def bench_concurrency(jobs, workers_list, size, rate, max_connections, interval):
+    # Fixed worker counts vs the adaptive limiter against a server that caps
+    # each connection at `rate` and answers 429 past `max_connections`
+    print(f"{jobs} jobs x {size // 1024} KiB, {rate // 1024} KiB/s per connection, "
+          f"429 above {max_connections} connections")
+    print(f"{'run':12}{'jobs/min':>10}{'MiB/s':>8}{'failed':>8}{'429s':>6}{'limit':>8}")
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp, \
+            FakeMediaServer(size=size, rate=rate, max_connections=max_connections) as server:
+        os.chdir(tmp)
+        try:
+            runs = [(f"fixed {w}", w) for w in workers_list] + [("adaptive", None)]
+            for label, workers in runs:
+                config = {"quiet": True, "adjust_interval": interval, "max_downloads": max(workers_list)}
+                engine = make_engine(max_workers=workers, config=config, skip_downloaded=False)
+                throttled_before = server.throttled
+                urls = [server.url(f"{label.replace(' ', '')}-{i}") for i in range(jobs)]
+                elapsed, completed, failed = run_batch(engine, urls)
+                mib = completed * size / 1048576
+                limits = sorted({limit for _, limit, _ in engine.limiter.history}) or [engine.limiter.limit]
+                limit_range = f"{limits[0]}-{limits[-1]}" if len(limits) > 1 else str(limits[0])
+                print(f"{label:12}{completed / elapsed * 60:>10.1f}{mib / elapsed:>8.2f}{failed:>8}"
+                      f"{server.throttled - throttled_before:>6}{limit_range:>8}")
+                engine.close()
+        finally:
+            os.chdir(cwd)
+
+def bench_sessions(jobs, workers, size):
+    # Many small files, where per-job YoutubeDL setup is a big share of the
+    # work: a fresh instance per job vs instances reused from the SessionPool
+    print(f"{jobs} jobs x {size // 1024} KiB, {workers} workers")
+    print(f"{'run':12}{'jobs/min':>10}{'failed':>8}{'instances':>11}")
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp, FakeMediaServer(size=size) as server:
+        os.chdir(tmp)
+        try:
+            for label, reuse in (("fresh", False), ("reused", True)):
+                config = {"quiet": True, "reuse_sessions": reuse}
+                engine = make_engine(max_workers=workers, config=config, skip_downloaded=False)
+                urls = [server.url(f"{label}-{i}") for i in range(jobs)]
+                elapsed, completed, failed = run_batch(engine, urls)
+                print(f"{label:12}{completed / elapsed * 60:>10.1f}{failed:>8}{engine.sessions.created:>11}")
+                engine.close()
+        finally:
+            os.chdir(cwd)
+
+def check_payload(path, size):
+    # FakeMediaServer files hold byte i % 256 at offset i
+    expected = bytes(range(256)) * (size // 256 + 1)
+    with open(path, "rb") as f:
+        return f.read() == expected[:size]
+
+def bench_segmented(jobs, segments_list, size, rate, workers):
+    # Single-connection downloads vs N ranges per file against a server that
+    # caps every connection at `rate`; every file is checked byte for byte
+    print(f"{jobs} jobs x {size // 1048576} MiB, {rate // 1024} KiB/s per connection, {workers} workers")
+    print(f"{'run':14}{'jobs/min':>10}{'MiB/s':>8}{'failed':>8}{'valid':>7}")
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp, FakeMediaServer(size=size, rate=rate) as server:
+        os.chdir(tmp)
+        try:
+            for segments in segments_list:
+                label = "single" if segments < 2 else f"{segments} segments"
+                config = {"quiet": True, "segmented_downloads": segments > 1, "download_segments": segments}
+                engine = make_engine(max_workers=workers, config=config, skip_downloaded=False)
+                folder = f"seg{segments}"
+                urls = [server.url(f"{folder}-{i}") for i in range(jobs)]
+                elapsed, completed, failed = run_batch(engine, urls, folder_name=folder)
+                download_dir = os.path.join("downloads", folder)
+                valid = sum(check_payload(os.path.join(download_dir, name), size) for name in os.listdir(download_dir))
+                print(f"{label:14}{completed / elapsed * 60:>10.1f}{completed * size / 1048576 / elapsed:>8.2f}"
+                      f"{failed:>8}{valid:>7}")
+                engine.close()
+
+            # Video + audio of one merge-style download: fetched one after
+            # the other by yt-dlp, side by side when segmenting. Merging is
+            # switched off since the payload isn't real media.
+            from segmented import SegmentedYoutubeDL
+            print("video + audio pair:")
+            for segments in segments_list:
+                label = "single" if segments < 2 else f"{segments} segments"
+                tag = f"pair{segments}"
+                info = {'id': tag, 'title': tag, 'extractor': 'bench', 'extractor_key': 'Bench',
+                        'webpage_url': server.url(tag),
+                        'formats': [{'format_id': 'v', 'url': server.url(tag + 'v'), 'ext': 'mp4',
+                                     'vcodec': 'avc1', 'acodec': 'none'},
+                                    {'format_id': 'a', 'url': server.url(tag + 'a', 'm4a'), 'ext': 'm4a',
+                                     'vcodec': 'none', 'acodec': 'mp4a.40.2'}]}
+                opts = {'quiet': True, 'no_warnings': True, 'noprogress': True, 'format': 'v+a',
+                        'allow_unplayable_formats': True, 'outtmpl': os.path.join(tag, '%(title)s.%(ext)s'),
+                        'download_segments': segments}
+                start = time.monotonic()
+                with SegmentedYoutubeDL(opts) as ydl:
+                    ydl.process_ie_result(info, download=True)
+                elapsed = time.monotonic() - start
+                valid = sum(check_payload(os.path.join(tag, name), size) for name in os.listdir(tag))
+                print(f"{label:14}{elapsed:>9.2f}s{2 * size / 1048576 / elapsed:>8.2f} MiB/s, {valid}/2 valid")
+        finally:
+            os.chdir(cwd)
+
+def bench_bandwidth(cap, tracks, video_size, track_size, segments, workers):
+    # One big video over `segments` connections next to a queue of small
+    # tracks in another folder: no cap, a cap with first-come first-served
+    # tokens, and a cap with fair share per folder
+    print(f"1 x {video_size // 1048576} MiB video ({segments} connections) + {tracks} x "
+          f"{track_size // 1024} KiB tracks, {workers} workers, cap {cap / 1048576:.1f} MiB/s")
+    print(f"{'run':10}{'MiB/s':>8}{'tracks done':>13}{'video done':>12}")
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp, FakeMediaServer(size=video_size) as video_server, \
+            FakeMediaServer(size=track_size) as track_server:
+        os.chdir(tmp)
+        try:
+            for label, rate, fair in (("no cap", None, True), ("fifo", cap, False), ("fair", cap, True)):
+                config = {"quiet": True, "segmented_downloads": True, "download_segments": segments,
+                          "fair_bandwidth": fair}
+                engine = make_engine(max_workers=workers, config=config, skip_downloaded=False, max_bandwidth=rate)
+                done = {}
+                engine.subscribe(lambda event, job, changes: done.__setitem__(job.folder + job.id, time.monotonic())
+                                 if event == "completed" else None)
+                start = time.monotonic()
+                tag = label.replace(" ", "")
+                engine.add_video(video_server.url(f"{tag}-video"), "mp4", "video")
+                for i in range(tracks):
+                    engine.add_video(track_server.url(f"{tag}-{i}", "m4a"), "mp4", "audio")
+                engine.wait()
+                elapsed = time.monotonic() - start
+                track_done = max(t for k, t in done.items() if k.startswith("audio")) - start
+                video_done = max(t for k, t in done.items() if k.startswith("video")) - start
+                total = video_size + tracks * track_size
+                print(f"{label:10}{total / 1048576 / elapsed:>8.2f}{track_done:>12.1f}s{video_done:>11.1f}s")
+                engine.close()
+        finally:
+            os.chdir(cwd)
+
+def bench_load(sizes, workers, size, tick_ms, page_delay, fail_rate):
+    # A Spotify playlist of n tracks end to end: paged from FakeSpotify,
+    # searched with the media server's search(), downloaded from it, with
+    # a simulated UI loop watching the whole time
+    print(f"Spotify playlists of {', '.join(map(str, sizes))} tracks, {size // 1024} KiB per file, "
+          f"{workers} workers, UI tick {tick_ms} ms")
+    print(f"{'items':>6}{'jobs/min':>10}{'failed':>8}{'add()':>9}{'1st item':>10}"
+          f"{'late p99':>10}{'late max':>10}{'tick p99':>10}{'memory':>10}{'per job':>10}")
+
+    import yt_dlp  # Loaded up front so it doesn't count as queue memory
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp, FakeMediaServer(size=size, fail_rate=fail_rate) as server:
+        os.chdir(tmp)
+        try:
+            for n in sizes:
+                spotify = FakeSpotify(delay=page_delay)
+                url = spotify.add_playlist(f"load{n}", n)
+                resolver = Resolver(search=server.search, cache=DiskCache("query_cache", db_path=":memory:"))
+                engine = make_engine(max_workers=workers, resolver=resolver, spotify=spotify,
+                                     skip_downloaded=False)
+                table = ProgressTable()
+                engine.subscribe(table.push)
+                counts = {"completed": 0, "failed": 0}
+                first_item = []
+
+                def on_event(event, job, changes):
+                    if job.kind != "video":
+                        return
+                    if event == "added" and not first_item:
+                        first_item.append(time.monotonic())
+                    elif event in counts:
+                        counts[event] += 1
+
+                engine.subscribe(on_event)
+                ui = UiLoop(table, tick_ms)
+                baseline = rss_bytes()
+                ui.start()
+                start = time.monotonic()
+                engine.add(url, "mp4", f"load{n}")
+                add_latency = time.monotonic() - start
+                engine.wait()
+                elapsed = time.monotonic() - start
+                ui.stop()
+
+                first = (first_item[0] - start) * 1000 if first_item else float("nan")
+                done = counts["completed"] + counts["failed"]
+                if baseline and ui.peak_rss:
+                    grown = max(0, ui.peak_rss - baseline)
+                    memory, per_job = f"{grown / 1048576:.1f}M", f"{grown / max(n, 1) / 1024:.1f}K"
+                else:
+                    memory = per_job = "-"
+                print(f"{n:>6}{done / elapsed * 60:>10.1f}{counts['failed']:>8}{add_latency * 1000:>7.1f}ms"
+                      f"{first:>8.0f}ms{percentile(ui.late, 99) * 1000:>8.1f}ms{max(ui.late) * 1000:>8.1f}ms"
+                      f"{percentile(ui.work, 99) * 1000:>8.1f}ms{memory:>10}{per_job:>10}")
+                engine.close()
+        finally:
+            os.chdir(cwd)
+
+def bench_spotify(albums, album_size, tracks, delay):
+    # Resolving a pasted mix of album and single-track links against a stub
+    # SpotAPI with `delay` seconds per request: cold, then again with the
+    # catalogue cache warm. The single tracks come from the albums too, so
+    # even the cold run finds most of them in the catalogue.
+    spotify = FakeSpotify(delay=delay)
+    links = [spotify.add_album(f"album{a}", album_size) for a in range(albums)]
+    spotify.add_album("singles", tracks)
+    links += [spotify.track_url(f"album{i % albums}", i % album_size) for i in range(tracks)]
+    links += [spotify.track_url("singles", i) for i in range(tracks)]
+    catalogue = SpotifyCatalogue(public=spotify, cache=DiskCache("spotify_catalogue", db_path=":memory:"))
+
+    print(f"{albums} albums x {album_size} tracks + {2 * tracks} single-track links "
+          f"({tracks} from those albums), {delay * 1000:.0f} ms per request")
+    print(f"{'run':8}{'seconds':>9}{'tracks':>8}{'requests':>10}{'cache hits':>12}")
+    for label in ("cold", "warm"):
+        requests, hits = spotify.requests, catalogue.hits
+        start = time.monotonic()
+        found = sum(len(page) for page in iter_spotify_tracks(" ".join(links), catalogue=catalogue))
+        elapsed = time.monotonic() - start
+        print(f"{label:8}{elapsed:>9.2f}{found:>8}{spotify.requests - requests:>10}{catalogue.hits - hits:>12}")
+    catalogue.close()
+
+class QuietFileHandler(SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+def bench_tagging(albums, album_size, workers):
+    # The tagging stage over albums of short MP3s, with the tags parsed from
+    # FakeSpotify album pages like a real queue's and the covers (1200px
+    # PNGs) served locally: the first run fetches and resizes each cover
+    # once for all of its tracks, the second finds them all cached.
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        server = None
+        try:
+            os.makedirs("covers")
+            for a in range(albums):
+                run_ffmpeg(["-f", "lavfi", "-i", "testsrc=size=1200x1200:duration=1:rate=1",
+                            "-vf", f"hue=h={a * 37}", "-frames:v", "1", f"covers/album{a}.png"])
+            run_ffmpeg(["-f", "lavfi", "-i", "sine=duration=30", "-c:a", "libmp3lame", "-b:a", "192k", "source.mp3"])
+            server = ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(QuietFileHandler, directory="covers"))
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+            spotify = FakeSpotify(cover_base=base_url)
+            links = [spotify.add_album(f"album{a}", album_size) for a in range(albums)]
+            artwork = ArtworkCache(cache=DiskCache("artwork_cache", db_path=":memory:"), directory="artwork")
+            engine = make_engine(config={"quiet": True, "embed_metadata": True}, artwork=artwork, spotify=spotify)
+            records = [record for page in iter_spotify_tracks(" ".join(links), catalogue=engine.catalogue)
+                       for record in page]
+            tracks = len(records)
+            print(f"{albums} albums x {album_size} tracks (30 s MP3s), {workers} workers")
+            print(f"{'run':8}{'seconds':>9}{'ms/track':>10}{'fetches':>9}{'cache hits':>12}{'cover files':>13}")
+            for label in ("cold", "warm"):
+                os.makedirs(label)
+                jobs = []
+                for i, record in enumerate(records):
+                    path = os.path.join(label, f"track{i}.mp3")
+                    shutil.copyfile("source.mp3", path)
+                    job = Job(str(i), path, "mp3", label, tags=spotify_tags(record))
+                    jobs.append((job, {"title": job.title, "filepath": path}))
+                fetches, hits = artwork.fetches, artwork.hits
+                start = time.monotonic()
+                with ThreadPoolExecutor(max_workers=workers) as pool:
+                    list(pool.map(lambda item: engine.tag_files(*item), jobs))
+                elapsed = time.monotonic() - start
+                print(f"{label:8}{elapsed:>9.2f}{elapsed * 1000 / tracks:>10.1f}{artwork.fetches - fetches:>9}"
+                      f"{artwork.hits - hits:>12}{len(os.listdir('artwork')):>13}")
+            engine.close()
+        finally:
+            if server is not None:
+                server.shutdown()
+                server.server_close()
+            os.chdir(cwd)
+
+def bench_jobs(items):
+    # Python memory held for a queue of `items` Spotify tracks, by the
+    # engine's job table and a UI job list (RowWindow over a CountingTree),
+    # while queued and after they all finished. Nothing is downloaded.
+    import tracemalloc
+    engine = make_engine()
+    table = ProgressTable()
+    engine.subscribe(table.push)
+    tree = CountingTree()
+    window = RowWindow(tree)
+
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    jobs = [engine._new_job(f"ytsearch1:Artist {i % 97} - Track {i}", "mp3", "bench",
+                            title=f"Artist {i % 97} - Track {i}")[0] for i in range(items)]
+    window.apply(*table.drain())
+    queued = tracemalloc.get_traced_memory()[0] - base
+    queued_rows, queued_waiting = len(tree.rows), len(window.waiting)
+
+    for job in jobs:
+        engine.update(job, progress="100%", status=COMPLETED, speed="-")
+        engine.set_state(job, jobstore.DONE)
+        engine.emit("completed", job)
+        engine._finish(job)
+    del jobs, job
+    window.apply(*table.drain())
+    finished = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+
+    print(f"{items} queued jobs, at most {window.max_active} active and {window.max_finished} finished rows shown")
+    print(f"{'':10}{'memory':>10}{'per job':>10}{'live jobs':>11}{'rows':>7}{'off-screen':>12}{'archived':>10}")
+    print(f"{'queued':10}{queued / 1048576:>9.1f}M{queued / items:>9.0f}B{items:>11}{queued_rows:>7}"
+          f"{queued_waiting:>12}{0:>10}")
+    print(f"{'finished':10}{finished / 1048576:>9.1f}M{finished / items:>9.0f}B{len(engine.jobs):>11}"
+          f"{len(tree.rows):>7}{len(window.waiting):>12}{window.archived:>10}")
+    engine.close()
+
+def bench_interrupt(size, rate, after, timeout=10):
+    # Ctrl+C on a headless run in the middle of a slow download: the process
+    # has to exit promptly instead of finishing the download first
+    print(f"1 x {size // 1048576} MiB at {rate // 1024} KiB/s, SIGINT after {after:.1f}s")
+    downloader = os.path.join(os.path.dirname(os.path.abspath(__file__)), "downloader.py")
+    with tempfile.TemporaryDirectory() as tmp, FakeMediaServer(size=size, rate=rate) as server:
+        proc = subprocess.Popen([sys.executable, downloader, "--headless", server.url("interrupt"),
+                                 "--no-resume", "--redownload"], cwd=tmp,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        time.sleep(after)
+        sent = server.bytes_sent
+        start = time.monotonic()
+        proc.send_signal(signal.SIGINT)
+        try:
+            code = proc.wait(timeout)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+            print(f"still running {timeout}s after SIGINT, killed")
+            sys.exit(1)
+        elapsed = time.monotonic() - start
+        time.sleep(1)  # Anything still downloading would show up here
+        print(f"{'exit code':>10}{'exit in':>10}{'KiB before':>12}{'KiB after':>11}")
+        print(f"{code:>10}{elapsed:>9.2f}s{sent // 1024:>12}{(server.bytes_sent - sent) // 1024:>11}")
+        if code != 130:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Download pipeline benchmarks")
+    sub = parser.add_subparsers(dest="scenario", required=True)
+
+    p = sub.add_parser("progress", help="UI event-loop callbacks for progress updates, before/after coalescing")
+    p.add_argument("--workers", type=int, default=3)
+    p.add_argument("--events", type=int, default=2000, help="progress hook calls per job")
+    p.add_argument("--duration", type=float, default=2.0, help="seconds each simulated download takes")
+    p.add_argument("--tick-ms", type=int, default=100)
+
+    p = sub.add_parser("concurrency", help="Throughput of fixed worker counts vs the adaptive limiter")
+    p.add_argument("--jobs", type=int, default=40)
+    p.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    p.add_argument("--size", type=int, default=2 * 1024 * 1024, help="bytes per file")
+    p.add_argument("--rate", type=int, default=512 * 1024, help="bytes/s per connection")
+    p.add_argument("--max-connections", type=int, default=6, help="server answers 429 above this")
+    p.add_argument("--interval", type=float, default=1.0, help="adaptive adjustment window (s)")
+
+    p = sub.add_parser("sessions", help="Fresh YoutubeDL per job vs reused sessions")
+    p.add_argument("--jobs", type=int, default=100)
+    p.add_argument("--workers", type=int, default=3)
+    p.add_argument("--size", type=int, default=64 * 1024, help="bytes per file")
+
+    p = sub.add_parser("segmented", help="Single-connection vs segmented downloads")
+    p.add_argument("--jobs", type=int, default=4)
+    p.add_argument("--segments", type=int, nargs="+", default=[1, 2, 4, 8])
+    p.add_argument("--size", type=int, default=8 * 1024 * 1024, help="bytes per file")
+    p.add_argument("--rate", type=int, default=1024 * 1024, help="bytes/s per connection")
+    p.add_argument("--workers", type=int, default=2)
+
+    p = sub.add_parser("bandwidth", help="Bandwidth cap with and without fair share")
+    p.add_argument("--cap", type=int, default=4 * 1024 * 1024, help="total bytes/s")
+    p.add_argument("--tracks", type=int, default=8)
+    p.add_argument("--video-size", type=int, default=24 * 1024 * 1024)
+    p.add_argument("--track-size", type=int, default=1024 * 1024)
+    p.add_argument("--segments", type=int, default=8)
+    p.add_argument("--workers", type=int, default=3)
+
+    p = sub.add_parser("load", help="Jobs/min, enqueue latency, UI lag and memory for big Spotify playlists")
+    p.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 10000], help="tracks per playlist")
+    p.add_argument("--workers", type=int, default=4)
+    p.add_argument("--size", type=int, default=16 * 1024, help="bytes per file")
+    p.add_argument("--tick-ms", type=int, default=100)
+    p.add_argument("--page-delay", type=float, default=0.05, help="seconds per 100-track Spotify page")
+    p.add_argument("--fail-rate", type=float, default=0.0, help="share of requests answered with HTTP 500")
+
+    p = sub.add_parser("spotify", help="Album and single-track resolution, cold vs cached catalogue")
+    p.add_argument("--albums", type=int, default=5)
+    p.add_argument("--album-size", type=int, default=20)
+    p.add_argument("--tracks", type=int, default=40, help="single-track links from the albums, and as many others")
+    p.add_argument("--delay", type=float, default=0.1, help="seconds per stub SpotAPI request")
+
+    p = sub.add_parser("tagging", help="Tagging stage with the shared artwork cache, cold vs warm")
+    p.add_argument("--albums", type=int, default=4)
+    p.add_argument("--album-size", type=int, default=12)
+    p.add_argument("--workers", type=int, default=4)
+
+    p = sub.add_parser("jobs", help="Memory of the job table and job list for a big queue")
+    p.add_argument("--items", type=int, default=10000)
+
+    p = sub.add_parser("interrupt", help="Ctrl+C on a headless run while a download is in progress")
+    p.add_argument("--size", type=int, default=64 * 1024 * 1024, help="bytes of the file")
+    p.add_argument("--rate", type=int, default=1024 * 1024, help="bytes/s per connection")
+    p.add_argument("--after", type=float, default=2.0, help="seconds before SIGINT")
+
+    args = parser.parse_args()
+    if args.scenario == "progress":
+        bench_progress(args.workers, args.events, args.duration, args.tick_ms)
+    elif args.scenario == "concurrency":
+        bench_concurrency(args.jobs, args.workers, args.size, args.rate, args.max_connections, args.interval)
+    elif args.scenario == "sessions":
+        bench_sessions(args.jobs, args.workers, args.size)
+    elif args.scenario == "segmented":
+        bench_segmented(args.jobs, args.segments, args.size, args.rate, args.workers)
+    elif args.scenario == "bandwidth":
+        bench_bandwidth(args.cap, args.tracks, args.video_size, args.track_size, args.segments, args.workers)
+    elif args.scenario == "load":
+        bench_load(args.sizes, args.workers, args.size, args.tick_ms, args.page_delay, args.fail_rate)
+    elif args.scenario == "spotify":
+        bench_spotify(args.albums, args.album_size, args.tracks, args.delay)
+    elif args.scenario == "tagging":
+        bench_tagging(args.albums, args.album_size, args.workers)
+    elif args.scenario == "jobs":
+        bench_jobs(args.items)
+    elif args.scenario == "interrupt":
+        bench_interrupt(args.size, args.rate, args.after)
@@ -0,0 +1,75 @@
+import json
+import time
+import sqlite3
+import threading
+
+CACHE_DB = "cache.db"
+
+class DiskCache:
+    """Persistent key -> JSON value cache with optional per-entry expiry.
+
+    Each cache is one table in CACHE_DB, so several caches can share the
+    file. Safe to use from any thread.
+    """
+
+    def __init__(self, name, ttl=None, db_path=CACHE_DB):
+        self.name = name
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(f"CREATE TABLE IF NOT EXISTS {name} "
+                          "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL)")
+        self.conn.commit()
+
+    def _expiry(self, ttl):
+        ttl = self.ttl if ttl is None else ttl
+        return time.time() + ttl if ttl else None
+
+    def get(self, key, default=None):
+        with self._lock:
+            row = self.conn.execute(f"SELECT value, expires FROM {self.name} WHERE key = ?", (key,)).fetchone()
+        if row is None or (row[1] is not None and row[1] < time.time()):
+            return default
+        return json.loads(row[0])
+
+    def get_many(self, keys):
+        # {key: value} for the keys that are cached and not expired
+        keys = list(keys)
+        found = {}
+        now = time.time()
+        with self._lock:
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                rows = self.conn.execute(
+                    f"SELECT key, value, expires FROM {self.name} WHERE key IN ({','.join('?' * len(chunk))})",
+                    chunk).fetchall()
+                for key, value, expires in rows:
+                    if expires is None or expires >= now:
+                        found[key] = json.loads(value)
+        return found
+
+    def set(self, key, value, ttl=None):
+        self.set_many({key: value}, ttl)
+
+    def set_many(self, items, ttl=None):
+        expires = self._expiry(ttl)
+        with self._lock:
+            self.conn.executemany(f"INSERT OR REPLACE INTO {self.name} (key, value, expires) VALUES (?, ?, ?)",
+                                  [(key, json.dumps(value), expires) for key, value in items.items()])
+            self.conn.commit()
+
+    def delete(self, key):
+        with self._lock:
+            self.conn.execute(f"DELETE FROM {self.name} WHERE key = ?", (key,))
+            self.conn.commit()
+
+    def purge_expired(self):
+        with self._lock:
+            self.conn.execute(f"DELETE FROM {self.name} WHERE expires IS NOT NULL AND expires < ?", (time.time(),))
+            self.conn.commit()
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
@@ -0,0 +1,28 @@
+import os
+import json
+
+CONFIG_FILE = "config.json"
+
+class ConfigManager:
+    def __init__(self):
+        self.config = {}
+        self.load_config()
+
+    def load_config(self):
+        if os.path.exists(CONFIG_FILE):
+            try:
+                with open(CONFIG_FILE, 'r') as f:
+                    self.config = json.load(f)
+            except:
+                self.config = {}
+
+    def save_config(self):
+        with open(CONFIG_FILE, 'w') as f:
+            json.dump(self.config, f, indent=4)
+            
+    def get(self, key, default=None):
+        return self.config.get(key, default)
+        
+    def set(self, key, value):
+        self.config[key] = value
+        self.save_config()
@@ -0,0 +1,1140 @@
+import os
+import re
+import sys
+import json
+import time
+import datetime
+import threading
+import contextlib
+import itertools
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import jobstore
+import install_ffmpeg
+import postprocess
+import tagging
+from config import ConfigManager
+from history import HistoryManager
+from jobstore import JobStore
+from resolver import Resolver, iter_youtube_playlist
+from spotify import SpotifyCatalogue, iter_spotify_tracks, parse_spotify_url, track_query
+from scheduler import AdaptiveLimiter, BandwidthGovernor, POSTPROCESS_WORKERS, DEFAULT_PRIORITY
+from sessions import SessionPool, MAX_IDLE_SESSIONS, DOWNLOAD_SEGMENTS
+from metadata import MetadataStore
+from metrics import PipelineStats, MetricsLog, MetricsServer
+from retry import (CircuitBreaker, classify_error, should_retry, retry_delay, LABELS, MAX_ATTEMPTS,
+                   THROTTLED, EXPIRED, FFMPEG)
+
+MAX_BACKLOG = 200  # Jobs queued ahead of the workers before playlist expansion waits
+MAX_ACTIVE_ROWS = 500  # Unfinished jobs shown in a job list, the rest wait off-screen
+MAX_FINISHED_ROWS = 200  # Finished jobs kept on screen before the oldest are archived
+FIRST_READ_BYTES = 1024  # yt-dlp's first read of a fresh HTTP download is at most this (its default buffersize)
+
+# Statuses the engine sets itself. Progress hooks add free-form ones
+# on top ("Downloading", "Processing...", "Fetching Playlist..." etc.)
+QUEUED = "Queued"
+RESOLVING = "Resolving"
+COMPLETED = "Completed"
+SKIPPED = "Skipped"
+ERROR = "Error"
+
+LINK_SEPARATOR_RE = re.compile(r"[\s,]+")
+YOUTUBE_ID_RE = re.compile(r'(?:[?&]v=|youtu\.be/|/shorts/|/embed/|/live/)([A-Za-z0-9_-]{11})')
+
+def sanitize_folder_name(folder_name):
+    # Basic sanitization for folder name
+    return "".join(c for c in folder_name if c.isalnum() or c in (' ', '-', '_')).strip()
+
+def get_download_dir(folder_name):
+    base_dir = os.path.join(os.getcwd(), 'downloads')
+    if folder_name:
+        return os.path.join(base_dir, folder_name)
+    return base_dir
+
+def split_links(text):
+    # Several links pasted at once, separated by whitespace or commas
+    return [link for link in LINK_SEPARATOR_RE.split(text or "") if link]
+
+def identity_key(url):
+    # Canonical key for a queued URL, worked out without touching the network:
+    # "youtube:<id>" for the usual YouTube URL shapes, "query:<text>" for
+    # searches (Spotify tracks). Playlists and unknown sites get None.
+    if url.startswith("ytsearch"):
+        query = url.split(":", 1)[1] if ":" in url else url
+        return "query:" + " ".join(query.lower().split())
+    if "list=" in url:
+        return None
+    if "youtube.com" in url or "youtu.be" in url:
+        match = YOUTUBE_ID_RE.search(url)
+        if match:
+            return "youtube:" + match.group(1)
+    return None
+
+def metadata_key(url):
+    # Info cache key: the identity where there is one, else the URL itself
+    return identity_key(url) or "url:" + url
+
+def format_size(size):
+    if not size:
+        return "-"
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+def info_entries(info):
+    # Flattens a yt-dlp result (video, search or playlist) into video dicts.
+    # Playlist entries can be None when ignoreerrors skipped them.
+    if not info:
+        return
+    if 'entries' in info:
+        for entry in info.get('entries') or []:
+            yield from info_entries(entry)
+    else:
+        yield info
+
+def entry_key(entry):
+    # Same shape as identity_key(), from a resolved info dict
+    if entry.get('id') and entry.get('extractor_key'):
+        return f"{entry['extractor_key'].lower()}:{entry['id']}"
+    return None
+
+def entry_filepath(entry):
+    # Final file after post-processing (e.g. the .mp3, not the source .webm)
+    downloads = entry.get('requested_downloads') or []
+    if downloads and downloads[-1].get('filepath'):
+        return downloads[-1]['filepath']
+    return entry.get('filepath') or entry.get('_filename')
+
+def is_resumed(d):
+    # Whether the first progress report of a stream started from bytes
+    # already on disk. yt-dlp doesn't say, but a fresh download's first
+    # report is one small read (or the first fragment), so at most one
+    # read / fragment of a resumed download goes uncounted.
+    if d.get('status') != 'downloading':
+        return True  # "finished" with nothing downloaded: the file was there
+    if d.get('fragment_index') is not None:
+        return d['fragment_index'] > 1
+    return d.get('downloaded_bytes', 0) > FIRST_READ_BYTES
+
+class Cancelled(Exception):
+    # Raised from the progress hook once the engine is cancelled; yt-dlp lets
+    # it through, which stops the download
+    pass
+
+class Job:
+    # Slotted: a 10k-item import keeps this many of them alive at once
+    __slots__ = ("id", "url", "fmt", "folder", "kind", "key", "title", "progress", "status", "state", "speed",
+                 "error", "error_class", "video_url", "in_backlog", "attempts", "bytes_seen", "bytes_total",
+                 "timings", "size", "priority", "postprocess_action", "parent", "children_total",
+                 "children_done", "children_failed", "expanding", "expanded", "created_at", "duration",
+                 "tags")
+
+    def __init__(self, job_id, url, fmt, folder_name, title=None, kind="video", status=QUEUED, state=None,
+                 priority=DEFAULT_PRIORITY, duration=None, tags=None):
+        self.id = job_id
+        self.url = url
+        self.fmt = fmt
+        self.folder = folder_name
+        self.kind = kind  # "video", or "spotify" / "playlist" for jobs that expand into videos
+        self.key = identity_key(url) if kind == "video" else None
+        self.title = title or url
+        self.progress = "0%"
+        self.status = status
+        # Persisted lifecycle state (see jobstore), separate from the display status
+        self.state = state or (jobstore.QUEUED if kind == "video" else jobstore.RESOLVING)
+        self.speed = "-"
+        self.error = None
+        self.error_class = None  # See retry.py
+        self.video_url = None  # Concrete video a search query resolved to
+        self.in_backlog = False
+        self.attempts = 0
+        self.bytes_seen = 0
+        self.bytes_total = 0  # Downloaded over all attempts
+        self.timings = {}  # stage -> seconds, see metrics.STAGES
+        self.size = None  # Expected bytes, known once the metadata is fetched
+        self.priority = priority  # Bandwidth share, see scheduler.PRIORITIES
+        self.duration = duration  # Expected length in seconds (Spotify tracks), helps pick the search result
+        self.tags = tags  # Known tags (Spotify tracks), take precedence over the info dict's, see tagging.py
+        self.postprocess_action = None  # "transcoded", "remuxed" or "kept" for audio jobs
+        # Playlist items point at their playlist job, which aggregates them
+        self.parent = None
+        self.children_total = 0
+        self.children_done = 0
+        self.children_failed = 0
+        self.expanding = kind != "video"
+        self.expanded = 0  # Playlist entries gone through so far, a retried expansion skips these
+        self.created_at = time.time()
+
+    @property
+    def display_folder(self):
+        return self.folder if self.folder else "root"
+
+    @property
+    def bandwidth_group(self):
+        # Playlist items share their playlist's slice of the bandwidth, single
+        # videos the slice of their folder
+        if self.parent is not None:
+            return f"playlist:{self.parent.id}"
+        return f"folder:{self.folder}"
+
+    @property
+    def needs_search(self):
+        return self.kind == "video" and self.url.startswith("ytsearch") and not self.video_url
+
+    def values(self):
+        # Row layout of the Downloads tab: (ID, Title, Folder, Progress, Status, Speed, Size)
+        return (self.id, self.title, self.display_folder, self.progress, self.status, self.speed,
+                format_size(self.size))
+
+class DownloadEngine:
+    """Queue, worker pool and event stream, with no Tk dependency.
+
+    Clients call add() and subscribe() to events. Listeners are called as
+    listener(event, job, changes) on whichever thread produced the event:
+
+        added      job was created (changes is empty)
+        updated    one or more of title/progress/status/speed changed
+        completed  download finished and was written to history
+        skipped    already downloaded earlier (file still on disk), nothing fetched
+        retrying   attempt failed, the job will run again after a delay
+        failed     job ended with an error (see job.error and job.error_class)
+    """
+
+    def __init__(self, history_manager=None, max_workers=None, skip_downloaded=True,
+                 job_store=None, resolver=None, config=None, metadata=None, max_bandwidth=None, spotify=None,
+                 catalogue=None, artwork=None):
+        # Limits come from config.json (see scheduler); max_workers pins the
+        # download concurrency instead of letting it adapt
+        self.config = config if config is not None else ConfigManager()
+        self.history_manager = history_manager if history_manager is not None else HistoryManager()
+        self.job_store = job_store if job_store is not None else JobStore()
+        # Search queries (Spotify tracks) go through the resolver's own pool first
+        self.resolver = resolver if resolver is not None else Resolver()
+        # Spotify track metadata, cached on disk; `spotify` stands in for
+        # spotapi.Public (e.g. a stub)
+        self.catalogue = catalogue if catalogue is not None else SpotifyCatalogue(public=spotify)
+        self.skip_downloaded = skip_downloaded
+        # Network-bound downloads and CPU-bound FFmpeg work run on separate
+        # pools; the download pool is sized for the maximum and the limiter
+        # decides how many of its threads may download at once
+        self.limiter = AdaptiveLimiter.from_config(self.config, max_workers)
+        # Total download rate cap shared by all workers (max_bandwidth in config.json)
+        self.bandwidth = BandwidthGovernor.from_config(self.config, max_bandwidth)
+        # Holds every download back for a while when the source rate-limits us
+        self.breaker = CircuitBreaker.from_config(self.config)
+        self.executor = ThreadPoolExecutor(max_workers=self.limiter.maximum, thread_name_prefix="download")
+        self.postprocess_workers = self.config.get("postprocess_workers", POSTPROCESS_WORKERS)
+        self.postprocess_executor = ThreadPoolExecutor(max_workers=self.postprocess_workers,
+                                                       thread_name_prefix="postprocess")
+        # Keep AAC/Opus audio as .m4a/.opus instead of transcoding to MP3
+        self.audio_passthrough = self.config.get("audio_passthrough", False)
+        # Info dicts are fetched on the resolver pool ahead of the download
+        # slots and cached on disk, so retries and re-queues skip extraction
+        self.metadata = metadata if metadata is not None else MetadataStore()
+        self.prefetch = self.config.get("prefetch_metadata", True)
+        # Finished audio files get title/artist/album/track tags and cover art,
+        # covers are fetched once per image and shared (see tagging.py)
+        self.embed_metadata = self.config.get("embed_metadata", True)
+        if artwork is None and self.embed_metadata and self.config.get("embed_artwork", True):
+            artwork = tagging.ArtworkCache.from_config(self.config)
+        self.artwork = artwork
+        # YoutubeDL instances live across jobs instead of one per download
+        self.sessions = SessionPool(max_idle=MAX_IDLE_SESSIONS if self.config.get("reuse_sessions", True) else 0)
+        self.jobs = {}  # Live jobs only, finished ones are dropped (history.db / jobs.db keep them)
+        self._ids = itertools.count(self.job_store.max_id() + 1)
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._pending = 0
+        self._inflight = {}  # (key, fmt, folder) -> queued/running job
+        self._backlog = 0  # Video jobs not yet picked up by a download worker
+        self._postprocess_backlog = 0  # Downloaded, waiting for an FFmpeg worker
+        self._room = threading.Condition(self._lock)
+        self._listeners = []
+        # Set by cancel(): running downloads stop at their next progress report
+        self.cancelled = threading.Event()
+        # Stage timings, bytes and results for the whole run (see metrics.py)
+        self.stats = PipelineStats()
+        self.subscribe(self.stats.on_event)
+
+    # -- Event stream --
+
+    def subscribe(self, listener):
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def emit(self, event, job, **changes):
+        for listener in list(self._listeners):
+            try:
+                listener(event, job, changes)
+            except Exception as e:
+                print(f"Event listener error: {e}")
+
+    def update(self, job, **changes):
+        for key, value in changes.items():
+            setattr(job, key, value)
+        self.emit("updated", job, **changes)
+
+    def set_state(self, job, state):
+        # Lifecycle transitions are persisted so the queue survives a restart
+        job.state = state
+        self.job_store.set_state(job)
+
+    # -- Job bookkeeping --
+
+    def _new_job(self, url, fmt, folder_name, job_id=None, **kwargs):
+        # Returns (job, created). If the same video/query is already queued or
+        # running for this format and folder, that job is returned instead.
+        inflight_key = None
+        if kwargs.get("kind", "video") == "video":
+            inflight_key = (identity_key(url) or url, fmt, folder_name)
+        with self._lock:
+            if inflight_key in self._inflight:
+                return self._inflight[inflight_key], False
+            job = Job(job_id or str(next(self._ids)), url, fmt, folder_name, **kwargs)
+            if inflight_key:
+                self._inflight[inflight_key] = job
+            if job.kind == "video":
+                job.in_backlog = True
+                self._backlog += 1
+            self.jobs[job.id] = job
+            self._pending += 1
+        self.job_store.save(job)
+        self.emit("added", job)
+        return job, True
+
+    def _leave_backlog(self, job):
+        with self._lock:
+            if job.in_backlog:
+                job.in_backlog = False
+                self._backlog -= 1
+                self._room.notify_all()
+
+    def wait_for_room(self, limit=MAX_BACKLOG):
+        # Backpressure for playlist expansion: block while the workers
+        # already have `limit` jobs waiting
+        with self._room:
+            self._room.wait_for(lambda: self._backlog < limit)
+
+    def _finish(self, job):
+        self._leave_backlog(job)
+        with self._lock:
+            if job.kind == "video":
+                self._inflight.pop((job.key or job.url, job.fmt, job.folder), None)
+            self._pending -= 1
+            if self._pending == 0:
+                self._idle.notify_all()
+            if self.jobs.get(job.id) is job:
+                del self.jobs[job.id]
+        if job.parent is not None:
+            self._child_finished(job.parent, failed=job.status == ERROR)
+
+    def _child_finished(self, parent, failed):
+        with self._lock:
+            parent.children_done += 1
+            if failed:
+                parent.children_failed += 1
+            done, total = parent.children_done, parent.children_total
+            all_done = not parent.expanding and done == total
+        self.update(parent, progress=f"{done * 100 // max(total, 1)}%", speed=f"{done}/{total}")
+        if all_done:
+            self._finish_playlist(parent)
+
+    def _finish_playlist(self, job):
+        # Last item done and nothing left to expand: close the aggregate row.
+        # A playlist whose listing broke off ends as failed (see expand_task).
+        if job.error:
+            status = f"Completed (partial: {LABELS[job.error_class]})"
+        elif job.children_failed:
+            status = f"Completed ({job.children_failed} failed)"
+        else:
+            status = COMPLETED
+        self.update(job, progress="100%", status=status, speed=f"{job.children_done}/{job.children_total}")
+        self.emit("failed" if job.error else "completed", job)
+        self._finish(job)
+
+    @property
+    def pending(self):
+        return self._pending
+
+    def wait(self, timeout=None):
+        # Blocks until every queued job (including ones spawned by playlist
+        # resolution) has finished. Returns False on timeout.
+        with self._idle:
+            return self._idle.wait_for(lambda: self._pending == 0, timeout)
+
+    def shutdown(self, wait=False):
+        self.executor.shutdown(wait=wait, cancel_futures=True)
+        self.postprocess_executor.shutdown(wait=wait, cancel_futures=True)
+
+    def cancel(self):
+        # Stop working for good. Queued jobs are dropped and running downloads
+        # abort; their jobs stay unfinished in jobs.db (and their .part files
+        # on disk), so the next run resumes them.
+        self.cancelled.set()
+        self.shutdown(wait=False)
+
+    def close(self):
+        # Flush history and the job store; unfinished jobs stay saved for resume()
+        self.shutdown(wait=False)
+        self.purge_caches()
+        self.resolver.shutdown(wait=False)
+        self.catalogue.close()
+        self.sessions.close()
+        self.metadata.close()
+        if self.artwork is not None:
+            self.artwork.close()
+        self.history_manager.close()
+        self.job_store.close()
+
+    def purge_caches(self):
+        # Expired rows (stale stream URLs, old search results) are never read
+        # again, drop them so cache.db doesn't keep growing
+        caches = [self.resolver.cache, self.metadata.cache, self.catalogue.cache]
+        if self.artwork is not None:
+            caches.append(self.artwork.cache)
+        for cache in caches:
+            try:
+                cache.purge_expired()
+            except Exception as e:
+                print(f"Cache Error: {e}")
+
+    def metrics(self):
+        # Counters from self.stats plus the current queue depth and pool usage
+        metrics = self.stats.snapshot()
+        active = metrics["stage_active"]
+        with self._lock:
+            metrics.update(pending=self._pending, backlog=self._backlog,
+                           postprocess_backlog=self._postprocess_backlog)
+        metrics.update(
+            downloads_active=self.limiter.active,
+            download_limit=self.limiter.limit,
+            postprocess_workers=self.postprocess_workers,
+            paused=self.breaker.paused,
+            utilisation={
+                "download": self.limiter.active / max(self.limiter.limit, 1),
+                "postprocess": (active.get("postprocess", 0) + active.get("tag", 0)) / self.postprocess_workers,
+                "resolve": (active.get("resolve", 0) + active.get("metadata", 0)) / self.resolver.max_workers,
+            })
+        return metrics
+
+    # -- Public API --
+
+    def add_links(self, text, fmt, folder_name="", priority=DEFAULT_PRIORITY):
+        # Everything pasted at once, see add_many()
+        return self.add_many(split_links(text), fmt, folder_name, priority=priority)
+
+    def add_many(self, links, fmt, folder_name="", priority=DEFAULT_PRIORITY):
+        # A list of links. Single Spotify tracks are grouped into one job so
+        # they are looked up as a batch; other links get a job each.
+        tracks = [link for link in links if "spotify.com" in link and parse_spotify_url(link)[0] == "track"]
+        jobs = [self.add(link, fmt, folder_name, priority=priority) for link in links if link not in tracks]
+        if len(tracks) > 1:
+            jobs.append(self.add_playlist(" ".join(tracks), fmt, folder_name, kind="spotify", priority=priority))
+        elif tracks:
+            jobs.append(self.add(tracks[0], fmt, folder_name, priority=priority))
+        return jobs
+
+    def add(self, url, fmt, folder_name="", priority=DEFAULT_PRIORITY):
+        if "spotify.com" in url:
+            return self.add_playlist(url, fmt, folder_name, kind="spotify", priority=priority)
+        if "list=" in url and ("youtube.com" in url or "youtu.be" in url):
+            return self.add_playlist(url, fmt, folder_name, kind="playlist", priority=priority)
+        return self.add_video(url, fmt, folder_name, priority=priority)
+
+    def add_video(self, url, fmt, folder_name="", title=None, job_id=None, parent=None, priority=DEFAULT_PRIORITY,
+                  duration=None, tags=None):
+        job, created = self._new_job(url, fmt, folder_name, title=title, job_id=job_id, priority=priority,
+                                     duration=duration, tags=tags)
+        if created:
+            if parent is not None:
+                with self._lock:
+                    job.parent = parent
+                    parent.children_total += 1
+            if job.needs_search or self.prefetch:
+                self.resolver.submit(self.resolve_task, job)
+            else:
+                self.executor.submit(self.download_task, job)
+        return job
+
+    def add_playlist(self, url, fmt, folder_name="", kind="playlist", job_id=None, priority=DEFAULT_PRIORITY):
+        if kind == "spotify":
+            links = url.split()
+            if len(links) > 1:
+                title = f"Parsing {len(links)} Spotify Links..."
+            else:
+                title = f"Parsing Spotify {parse_spotify_url(url)[0].title() or 'Link'}..."
+        else:
+            title = "Parsing YouTube Playlist..."
+        job, _ = self._new_job(url, fmt, folder_name, title=title, kind=kind, status=RESOLVING, job_id=job_id,
+                               priority=priority)
+        self._submit_expand(self.expand_task, job)
+        return job
+
+    def resume(self):
+        # Re-queue everything a previous run left unfinished, under the same IDs.
+        # Items of an already expanded playlist are plain video jobs by now, so
+        # only playlists that never finished expanding are fetched again.
+        # Partially downloaded files continue from their .part files.
+        self.job_store.prune_done()
+        rows = self.job_store.load_unfinished()
+        for row in sorted(rows, key=lambda row: row["kind"] != "video"):
+            self._requeue(row)
+        return len(rows)
+
+    def _requeue(self, row):
+        # Queue a jobs.db row again under its ID
+        priority = row["priority"] or DEFAULT_PRIORITY
+        if row["kind"] == "video":
+            self.add_video(row["url"], row["format"], row["folder"] or "", title=row["title"],
+                           job_id=str(row["id"]), priority=priority, duration=row["duration"],
+                           tags=json.loads(row["tags"]) if row["tags"] else None)
+        else:
+            self.add_playlist(row["url"], row["format"], row["folder"] or "", kind=row["kind"],
+                              job_id=str(row["id"]), priority=priority)
+
+    def failed_jobs(self, job_ids=None, limit=None):
+        # Jobs that gave up, from this run and earlier ones (jobs.db rows)
+        return self.job_store.load_failed(job_ids, limit)
+
+    def retry_failed(self, job_ids=None):
+        # Re-queue failed jobs (all of them, or the given IDs) under their IDs
+        rows = self.failed_jobs(job_ids)
+        for row in rows:
+            self._requeue(row)
+        return len(rows)
+
+    # -- Workers --
+
+    def expand_task(self, job):
+        # Streams a playlist into per-item jobs while it is still being paged
+        # through, waiting for room in the backlog so the queue doesn't balloon.
+        # The playlist row then stays as an aggregate of its items.
+        # Listing errors are retried like any other; a retry skips the
+        # entries already gone through (job.expanded).
+        seen = 0
+        try:
+            if job.kind == "spotify":
+                self.update(job, status="Fetching Playlist...")
+                for tracks in iter_spotify_tracks(job.url, catalogue=self.catalogue):
+                    for track in tracks:
+                        seen += 1
+                        if seen <= job.expanded:
+                            continue
+                        query = track_query(track)
+                        self.wait_for_room()
+                        self.add_video(f"ytsearch1:{query}", job.fmt, job.folder, title=query, parent=job,
+                                       priority=job.priority, duration=track['duration'],
+                                       tags=tagging.spotify_tags(track))
+                        job.expanded = seen
+                    self.update(job, status=f"Queued {job.children_total} songs...")
+            else:
+                self.update(job, status="Fetching Playlist...")
+                for entry in iter_youtube_playlist(job.url):
+                    seen += 1
+                    if seen <= job.expanded:
+                        continue
+                    url = entry.get('url') or entry.get('webpage_url')
+                    if not url: continue
+                    if entry.get('ie_key') == 'Youtube' and entry.get('id') and not url.startswith("http"):
+                        url = f"https://www.youtube.com/watch?v={entry['id']}"
+                    self.wait_for_room()
+                    self.add_video(url, job.fmt, job.folder, title=entry.get('title'), parent=job,
+                                   priority=job.priority)
+                    job.expanded = seen
+                    if job.children_total % 50 == 0:
+                        self.update(job, status=f"Queued {job.children_total} videos...")
+
+            if not job.children_total:
+                raise Exception("No tracks found.")
+
+        except Exception as e:
+            err_msg = str(e)
+            print(f"Playlist Error: {err_msg}")
+            error_class = classify_error(e)
+            job.attempts += 1
+            if should_retry(error_class, job.attempts):
+                # Still expanding: items already queued run meanwhile, but
+                # the playlist can't finish before the listing does
+                self.retry_later(job, err_msg, error_class, self._submit_expand, self.expand_task)
+                return
+            if not job.children_total:
+                self._fail(job, err_msg, error_class)
+                self._finish(job)
+                return
+            # Give up on the rest of the listing. What was queued still runs;
+            # the playlist stays failed in jobs.db so --retry-failed (or the
+            # Failed tab) fetches it again, finished items are then skipped.
+            job.error = err_msg
+            job.error_class = error_class
+        else:
+            # Listed in full, possibly after retries
+            job.error = job.error_class = None
+
+        # Without an error, expansion is persisted as done: on restart the items resume on their own
+        tracks = len(job.url.split())
+        self.update(job, title=f"{tracks} Spotify tracks" if tracks > 1 else f"Playlist: {job.url}")
+        self.set_state(job, jobstore.FAILED if job.error else jobstore.DONE)
+        with self._lock:
+            job.expanding = False
+            all_done = job.children_done == job.children_total
+        if all_done:
+            self._finish_playlist(job)
+        else:
+            self.update(job, status=f"Downloading (partial: {LABELS[job.error_class]})" if job.error
+                        else "Downloading")
+
+    def _submit_expand(self, task, job):
+        # submit() for retry_later: expansions run on their own thread
+        threading.Thread(target=task, args=(job,), daemon=True).start()
+
+    def _fail(self, job, err_msg, error_class=None):
+        # The full message goes to job.error (and jobs.db), the row gets the class
+        job.error = err_msg
+        job.error_class = error_class or classify_error(err_msg)
+        self.update(job, status=ERROR, speed=LABELS[job.error_class])
+        self.set_state(job, jobstore.FAILED)
+        self.emit("failed", job)
+
+    def handle_error(self, job, err_msg, error_class, submit, task):
+        # Retry with backoff if this kind of error is worth it, else give up
+        job.attempts += 1
+        if should_retry(error_class, job.attempts):
+            self.retry_later(job, err_msg, error_class, submit, task)
+        else:
+            self._fail(job, err_msg, error_class)
+            self._finish(job)
+
+    def skip_if_downloaded(self, job):
+        # Already have it? Decided before yt-dlp touches the network.
+        # Checks the queued identity and, once searched, the resolved video.
+        if not self.skip_downloaded:
+            return False
+        keys = [job.key, identity_key(job.video_url) if job.video_url else None]
+        if not any(keys):
+            return False
+        cached = self.history_manager.find_downloaded(keys, job.fmt, get_download_dir(job.folder))
+        if not cached:
+            return False
+        self.update(job, title=cached.get('title') or job.title, progress="100%",
+                    status=SKIPPED, speed="Already downloaded")
+        self.set_state(job, jobstore.DONE)
+        self.emit("skipped", job)
+        return True
+
+    def resolve_task(self, job):
+        # Lookup stage on the resolver's pool: "ytsearch1:<query>" -> concrete
+        # video, then its metadata, then hand the job to a download slot
+        try:
+            if self.skip_if_downloaded(job):
+                self._finish(job)
+                return
+            if job.needs_search:
+                self.update(job, status="Searching...")
+                self.set_state(job, jobstore.RESOLVING)
+                with self.stats.stage(job, "resolve"):
+                    result = self.resolver.resolve(job.url.split(":", 1)[1], duration=job.duration,
+                                                   gate=lambda: self.source_call(job))
+                if not result:
+                    raise Exception("No YouTube match found")
+                job.video_url = result['url']
+                self.set_state(job, jobstore.QUEUED)
+        except Exception as e:
+            err_msg = str(e)
+            error_class = classify_error(e)
+            self.handle_error(job, err_msg, error_class, self.resolver.submit, self.resolve_task)
+            return
+        if self.prefetch:
+            try:
+                self.fetch_metadata(job)
+            except Exception as e:
+                # Not fatal, the download extracts the info itself. Rate
+                # limiting was already reported by source_call().
+                if classify_error(e) != THROTTLED:
+                    print(f"Metadata Error: {e}")
+        self.update(job, status=QUEUED)
+        self.executor.submit(self.download_task, job)
+
+    def fetch_metadata(self, job):
+        # Cached info for the job's video, or a download=False extraction,
+        # so the row shows the real title and size while it waits
+        url = job.video_url or job.url
+        record = self.metadata.get(metadata_key(url))
+        if record is None:
+            self.update(job, status="Fetching info...")
+            with self.source_call(job), self.stats.stage(job, "metadata"), \
+                    self.sessions.checkout(self._ydl_opts(job, get_download_dir(job.folder))) as session:
+                info = session.ydl.extract_info(url, download=False)
+            record = self.metadata.put(metadata_key(url), info)
+            if record is None:
+                return
+        self.update(job, title=record["info"].get("title") or job.title, size=record["size"])
+
+    @contextlib.contextmanager
+    def source_call(self, job):
+        # Searches and info extractions on the resolver pool hit the same
+        # source as the downloads: they hold off while the circuit breaker has
+        # downloads paused, and their rate-limit errors count towards pausing
+        if self.breaker.paused:
+            self.update(job, status="Paused (rate limited)")
+        self.breaker.wait()
+        error_class = None
+        try:
+            yield
+        except Exception as e:
+            error_class = classify_error(e)
+            if error_class == THROTTLED:
+                self.limiter.record_error(throttled=True)
+            raise
+        finally:
+            self.throttle_done(error_class)
+
+    def throttle_done(self, error_class):
+        # Report an attempt to the circuit breaker (see retry.CircuitBreaker)
+        if self.breaker.done(error_class):
+            print(f"Source is rate-limiting, pausing downloads for {self.breaker.cooldown:.0f}s")
+
+    def _ydl_opts(self, job, download_dir):
+        ydl_opts = {
+            'outtmpl': os.path.join(download_dir, '%(title)s.%(ext)s'),
+            'continuedl': True,  # pick up .part files left by an interrupted run
+            # Playlists are expanded into one job per item, so let errors
+            # surface here and be retried rather than swallowed
+            'ignoreerrors': False,
+            'noplaylist': False,
+            'quiet': self.config.get("quiet", False),
+            'noprogress': self.config.get("quiet", False),
+        }
+
+        if job.fmt == 'mp3':
+            # Transcoding happens on the post-processing pool, not here
+            ydl_opts.update({'format': 'bestaudio/best'})
+        else:
+            ydl_opts.update({'format': 'bestvideo+bestaudio/best'})
+        if self.config.get("segmented_downloads", False):
+            # Several connections per file (see segmented.py)
+            ydl_opts['download_segments'] = self.config.get("download_segments", DOWNLOAD_SEGMENTS)
+        # Merging needs the ffmpeg from the tools dir, which may not be on PATH
+        ffmpeg_dir = install_ffmpeg.find_tools()
+        if ffmpeg_dir:
+            ydl_opts['ffmpeg_location'] = ffmpeg_dir
+        return ydl_opts
+
+    def download_task(self, job):
+        self._leave_backlog(job)
+        if self.breaker.paused:
+            self.update(job, status="Paused (rate limited)")
+        self.breaker.wait()
+        self.limiter.acquire()
+        error_class = None
+        try:
+            self.update(job, status="Initializing...")
+            self.set_state(job, jobstore.DOWNLOADING)
+
+            # Determine path
+            download_dir = get_download_dir(job.folder)
+            if not os.path.exists(download_dir):
+                os.makedirs(download_dir, exist_ok=True)
+
+            if self.skip_if_downloaded(job):
+                self._finish(job)
+                return
+
+            # Metadata fetched ahead of time (or on an earlier attempt) skips
+            # the extraction, as long as its stream URLs are still valid
+            url = job.video_url or job.url
+            record = self.metadata.get(metadata_key(url)) if self.prefetch else None
+
+            info = {}
+            with self.stats.stage(job, "download"), self.sessions.checkout(self._ydl_opts(job, download_dir)) as session:
+                session.on_progress = lambda d: self.progress_hook(job, d)
+                # Segmented downloads draw on the bandwidth per connection
+                session.on_bytes = lambda n: self.bandwidth.consume(job.bandwidth_group, n, job.priority)
+                if record:
+                    info = session.ydl.process_ie_result(record["info"], download=True)
+                else:
+                    info = session.ydl.extract_info(url, download=True)
+            self.limiter.record_success()
+            if self.prefetch:
+                # Done with the stream URLs; the history has the rest
+                self.metadata.forget(metadata_key(url))
+
+        except Exception as e:
+            if self.cancelled.is_set():
+                return  # Left as it is for the next run, see cancel()
+            err_msg = str(e)
+            error_class = classify_error(e)
+            self.limiter.record_error(throttled=error_class == THROTTLED)
+            if error_class == EXPIRED:
+                self.metadata.forget(metadata_key(job.video_url or job.url))
+            if error_class == FFMPEG:
+                err_msg = f"Merge Error (FFmpeg missing?): {err_msg}"
+            self.handle_error(job, err_msg, error_class, self.executor.submit, self.download_task)
+            return
+        finally:
+            self.limiter.release()
+            self.throttle_done(error_class)
+
+        if job.fmt == 'mp3':
+            self.update(job, status="Queued for conversion...")
+            with self._lock:
+                self._postprocess_backlog += 1
+            self.postprocess_executor.submit(self.postprocess_task, job, info, download_dir)
+        else:
+            self._complete(job, info, download_dir)
+
+    def postprocess_task(self, job, info, download_dir):
+        with self._lock:
+            self._postprocess_backlog -= 1
+        try:
+            self.set_state(job, jobstore.POSTPROCESSING)
+            self.convert(job, info)
+            if self.embed_metadata:
+                self.tag_files(job, info)
+            self._complete(job, info, download_dir)
+        except Exception as e:
+            err_msg = str(e)
+            if "ffmpeg" in err_msg.lower():
+                err_msg = f"Extract Audio Error (FFmpeg missing?): {err_msg}"
+            self._fail(job, err_msg, FFMPEG)
+            self._finish(job)
+
+    def convert(self, job, info):
+        self.update(job, status="Converting audio...")
+        with self.stats.stage(job, "postprocess"):
+            for item in info_entries(info):
+                src = entry_filepath(item)
+                if not src:
+                    continue
+                acodec = (item.get('requested_downloads') or [{}])[-1].get('acodec') or item.get('acodec')
+                dst, job.postprocess_action = postprocess.convert_audio(
+                    src, 'mp3', '192', acodec=acodec, passthrough=self.audio_passthrough,
+                    workers=self.postprocess_workers)
+                item['requested_downloads'] = [{'filepath': dst}]
+                item['filepath'] = dst
+
+    def tag_files(self, job, info):
+        # Tags and cover art written into the finished audio files by stream
+        # copy. Videos are left alone: rewriting a multi-GB file for a few
+        # tags costs more than they're worth. Not fatal: an untagged file
+        # is still a good download.
+        self.update(job, status="Tagging...")
+        with self.stats.stage(job, "tag"):
+            for item in info_entries(info):
+                path = entry_filepath(item)
+                if not path or not os.path.exists(path):
+                    continue
+                try:
+                    tags = tagging.merge_tags(job.tags, tagging.info_tags(item))
+                    cover = tags.pop('cover', None)
+                    cover = self.artwork.get(cover) if self.artwork is not None else None
+                    postprocess.write_tags(path, tags, cover)
+                except Exception as e:
+                    print(f"Tagging Error: {e}")
+
+    def _complete(self, job, info, download_dir):
+        self.update(job, progress="100%", status=COMPLETED, speed="-")
+
+        # Add to history
+        title = info.get('title', 'Unknown Title') if info else job.url
+        entry = {
+            "date": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "title": title,
+            "url": job.url,
+            "format": job.fmt,
+            "path": download_dir
+        }
+        with self.stats.stage(job, "history"):
+            self.history_manager.add_entry(entry)
+
+            # Remember every file we got under both the queued identity (e.g. the
+            # Spotify search query) and the resolved video ID
+            for item in info_entries(info):
+                filepath = entry_filepath(item)
+                if filepath:
+                    keys = {job.key, entry_key(item)}
+                    self.history_manager.mark_downloaded(keys, job.fmt, filepath, item.get('title'))
+        self.set_state(job, jobstore.DONE)
+        self.emit("completed", job)
+        self._finish(job)
+
+    def retry_later(self, job, err_msg, error_class, submit, task):
+        # submit(task, job) again after a jittered, growing delay, without
+        # holding a worker meanwhile
+        delay = retry_delay(error_class, job.attempts)
+        job.error = err_msg
+        job.error_class = error_class
+        self.update(job, status=f"Retry {job.attempts + 1}/{MAX_ATTEMPTS[error_class]} in {delay:.0f}s",
+                    speed=LABELS[error_class])
+        self.set_state(job, jobstore.QUEUED if job.kind == "video" else jobstore.RESOLVING)
+        self.emit("retrying", job, delay=delay)
+        timer = threading.Timer(delay, submit, args=(task, job))
+        timer.daemon = True
+        timer.start()
+
+    def progress_hook(self, job, d):
+        # Feed the limiter with bytes actually moved since the last call. For
+        # yt-dlp's own downloader this is also where the bandwidth cap holds
+        # the download thread back.
+        if self.cancelled.is_set():
+            raise Cancelled("Download cancelled")
+        downloaded = d.get('downloaded_bytes') or 0
+        if job.bytes_seen == 0 and downloaded and not d.get('segmented') and is_resumed(d):
+            # downloaded_bytes counts what a .part from an earlier run (or an
+            # already complete file) held; only what comes after is traffic
+            job.bytes_seen = downloaded
+        if downloaded > job.bytes_seen:
+            self.limiter.record_bytes(downloaded - job.bytes_seen)
+            self.stats.add_bytes(downloaded - job.bytes_seen)
+            job.bytes_total += downloaded - job.bytes_seen
+            if not d.get('segmented'):
+                self.bandwidth.consume(job.bandwidth_group, downloaded - job.bytes_seen, job.priority)
+        job.bytes_seen = downloaded if d['status'] == 'downloading' else 0
+
+        if d['status'] == 'downloading':
+            p = d.get('_percent_str', '').replace('%','')
+            speed = d.get('_speed_str', '')
+            self.update(job, progress=p+"%", status="Downloading", speed=speed)
+
+        elif d['status'] == 'finished':
+            self.update(job, status="Processing...", progress="100%")
+            if job.state != jobstore.POSTPROCESSING:
+                self.set_state(job, jobstore.POSTPROCESSING)
+
+class ProgressTable:
+    """Latest-state table between the workers and a UI tick.
+
+    Subscribe push() to the engine. Structural events (added, completed,
+    skipped, retrying, failed) are kept in order, while "updated" events are
+    coalesced per job, so a tick only sees each changed job once no matter
+    how many progress hook calls happened in between.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._events = []
+        self._dirty = {}  # job_id -> job, insertion ordered
+
+    def push(self, event, job, changes):
+        with self._lock:
+            if event == "updated":
+                self._dirty[job.id] = job
+            else:
+                self._events.append((event, job, changes))
+
+    def drain(self):
+        # Returns (events, dirty_jobs) accumulated since the last call
+        with self._lock:
+            events, dirty = self._events, self._dirty
+            self._events, self._dirty = [], {}
+        return events, list(dirty.values())
+
+class RowWindow:
+    """The part of a big queue a job list actually shows.
+
+    At most max_active unfinished jobs get a row; jobs added past that wait
+    off-screen and get one as rows free up. Finished rows stay until more
+    than max_finished pile up, then the oldest are dropped (archived: the
+    job lives on in history.db / jobs.db). Fed with ProgressTable.drain(),
+    it calls view.insert_row(job, values), view.update_row(job_id, values)
+    and view.delete_row(job_id), and only when a row's values changed.
+    """
+
+    def __init__(self, view, max_active=MAX_ACTIVE_ROWS, max_finished=MAX_FINISHED_ROWS):
+        self.view = view
+        self.max_active = max_active
+        self.max_finished = max_finished
+        self.rows = {}  # job_id -> values shown
+        self.finished = OrderedDict()  # Finished job_ids with a row, oldest first
+        self.waiting = OrderedDict()  # job_id -> job without a row yet
+        self.archived = 0
+
+    @property
+    def active(self):
+        return len(self.rows) - len(self.finished)
+
+    def apply(self, events, dirty):
+        for event, job, changes in events:
+            if event == "added":
+                self.finished.pop(job.id, None)  # A finished job queued again
+                if job.id in self.rows:
+                    self._refresh(job)
+                elif self.active < self.max_active:
+                    self._insert(job)
+                else:
+                    self.waiting[job.id] = job
+            elif event in ("completed", "skipped", "failed"):
+                if self.waiting.pop(job.id, None) is not None:
+                    self.archived += 1  # Done before it ever got a row
+                elif job.id in self.rows:
+                    # Final state must win even if no "updated" is pending
+                    self._refresh(job)
+                    self.finished[job.id] = True
+
+        for job in dirty:
+            if job.id in self.rows:
+                self._refresh(job)
+
+        while len(self.finished) > self.max_finished:
+            job_id, _ = self.finished.popitem(last=False)
+            self._delete(job_id)
+            self.archived += 1
+        while self.waiting and self.active < self.max_active:
+            _, job = self.waiting.popitem(last=False)
+            self._insert(job)
+
+    def _insert(self, job):
+        values = job.values()
+        self.rows[job.id] = values
+        self.view.insert_row(job, values)
+
+    def _refresh(self, job):
+        values = job.values()
+        if self.rows.get(job.id) != values:
+            self.rows[job.id] = values
+            self.view.update_row(job.id, values)
+
+    def _delete(self, job_id):
+        self.finished.pop(job_id, None)
+        if self.rows.pop(job_id, None) is not None:
+            self.view.delete_row(job_id)
+
+# -- Headless / CLI --
+
+def read_sources(sources):
+    # Each source is either a URL or a text file with one URL per line
+    # (blank lines and lines starting with '#' are skipped)
+    urls = []
+    for source in sources:
+        if os.path.isfile(source):
+            with open(source, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if line and not line.startswith('#'):
+                        urls.append(line)
+        elif source.strip():
+            urls.append(source.strip())
+    return urls
+
+def run_headless(sources, fmt="mp4", folder_name="", max_workers=None, redownload=False,
+                 resume=True, max_bandwidth=None, priority=DEFAULT_PRIORITY, retry_failed=False,
+                 metrics_log=None, metrics_port=None):
+    urls = read_sources(sources)
+    engine = DownloadEngine(max_workers=max_workers, skip_downloaded=not redownload, max_bandwidth=max_bandwidth)
+    counts = {"completed": 0, "skipped": 0, "failed": 0}
+
+    output_lock = threading.Lock()
+
+    def on_event(event, job, changes):
+        # Called from worker threads
+        with output_lock:
+            if event in ("completed", "failed") and job.kind != "video" and job.children_total:
+                print(f"[{job.id}] Playlist {job.status}: {job.speed} items")
+                if job.error:
+                    print(f"[{job.id}] Listing stopped early: {job.error}")
+            elif event == "completed":
+                counts["completed"] += 1
+                print(f"[{job.id}] Completed: {job.title}")
+            elif event == "skipped":
+                counts["skipped"] += 1
+                print(f"[{job.id}] Skipped (already downloaded): {job.title}")
+            elif event == "failed":
+                counts["failed"] += 1
+                print(f"[{job.id}] {LABELS[job.error_class]}: {job.title} ({job.error})")
+            elif event == "added" and job.kind != "video":
+                print(f"[{job.id}] Expanding: {job.url}")
+
+    engine.subscribe(on_event)
+
+    # Instrumentation: JSONL event log and/or a Prometheus endpoint
+    event_log = MetricsLog(engine, metrics_log) if metrics_log else None
+    metrics_server = MetricsServer(engine, metrics_port) if metrics_port else None
+    if metrics_server:
+        print(f"Metrics at {metrics_server.url}")
+
+    def close():
+        if event_log:
+            event_log.close()
+        if metrics_server:
+            metrics_server.close()
+        engine.close()
+
+    folder_name = sanitize_folder_name(folder_name) if folder_name else ""
+    start = time.monotonic()
+    if resume:
+        resumed = engine.resume()
+        if resumed:
+            print(f"Resuming {resumed} unfinished job(s) from the last run...")
+    if retry_failed:
+        retried = engine.retry_failed()
+        print(f"Retrying {retried} failed job(s)...")
+    if not urls and not engine.pending:
+        print("No URLs given.")
+        close()
+        return 2
+    limiter = engine.limiter
+    if limiter.adaptive:
+        print(f"Queuing {len(urls)} URL(s), {limiter.limit} concurrent download(s) "
+              f"adapting between {limiter.minimum} and {limiter.maximum}...")
+    else:
+        print(f"Queuing {len(urls)} URL(s) with {limiter.limit} worker(s)...")
+    if engine.bandwidth.rate:
+        print(f"Total bandwidth capped at {engine.bandwidth.rate / 1048576:.2f} MiB/s")
+    engine.add_many(urls, fmt, folder_name, priority=priority)
+
+    try:
+        # Poll so Ctrl+C is handled promptly
+        while not engine.wait(timeout=0.5):
+            pass
+    except KeyboardInterrupt:
+        print("Interrupted, cancelling pending jobs...")
+        engine.cancel()
+        close()
+        # Like closing the window: unfinished jobs are saved and resume on the
+        # next run, so don't wait for threads still inside a search or FFmpeg
+        sys.stdout.flush()
+        os._exit(130)
+
+    elapsed = time.monotonic() - start
+    finished = counts["completed"] + counts["skipped"] + counts["failed"]
+    rate = finished / elapsed * 60 if elapsed > 0 else 0.0
+    print(f"Done: {counts['completed']} completed, {counts['skipped']} skipped, {counts['failed']} failed "
+          f"in {elapsed:.1f}s ({rate:.1f} jobs/min)")
+    stats = engine.stats.snapshot()
+    stage_totals = stats["stage_seconds"]
+    busy = sum(stage_totals.values())
+    if busy:
+        # Summed over jobs, so stages running in parallel can exceed the elapsed time
+        print("Time per stage: " + ", ".join(
+            f"{stage} {seconds:.1f}s ({seconds * 100 / busy:.0f}%)"
+            for stage, seconds in sorted(stage_totals.items(), key=lambda kv: -kv[1])))
+    if stats["postprocess_jobs"]:
+        print("Post-processing: " + ", ".join(
+            f"{action} {stats['postprocess_jobs'][action]} in {seconds:.1f}s"
+            for action, seconds in sorted(stats["postprocess_seconds"].items(), key=lambda kv: -kv[1])))
+    if stats["bytes"]:
+        print(f"Downloaded {format_size(stats['bytes'])} ({format_size(stats['bytes'] / elapsed)}/s)")
+    if stats["retries"]:
+        print("Retries: " + ", ".join(f"{cls} {count}" for cls, count in sorted(stats["retries"].items())))
+    if counts["failed"]:
+        print("Run with --retry-failed to try the failed jobs again, --list-failed to see them.")
+    engine.shutdown(wait=True)
+    close()
+    return 1 if counts["failed"] else 0
+
+def list_failed():
+    # Failed jobs kept in jobs.db, for --list-failed
+    store = JobStore()
+    rows = store.load_failed()
+    store.close()
+    for row in rows:
+        label = LABELS.get(row["error_class"] or "", "Error")
+        print(f"[{row['id']}] {label}: {row['title'] or row['url']}")
+        print(f"    {row['url']}")
+        print(f"    {row['error']}")
+    print(f"{len(rows)} failed job(s)")
+    return 0
@@ -0,0 +1,257 @@
+"""Local stand-ins for YouTube and Spotify, for benchmarks.
+
+FakeMediaServer serves deterministic payloads at /media/<name>.<ext> with
+optional per-connection rate limiting, a cap on concurrent connections
+(extra ones get HTTP 429) and random failure injection; its search() can
+replace the resolver's YouTube search. FakeSpotify stands in for
+spotify.PublicApi with large paginated playlists and albums.
+"""
+import re
+import sys
+import time
+import random
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+CONTENT_TYPES = {"mp4": "video/mp4", "m4a": "audio/mp4", "webm": "video/webm", "mp3": "audio/mpeg"}
+CHUNK_SIZE = 64 * 1024
+
+class QuietHTTPServer(ThreadingHTTPServer):
+    # Clients dropping keep-alive connections is normal here, not an error
+    def handle_error(self, request, client_address):
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+class FakeMediaServer:
+    def __init__(self, size=2 * 1024 * 1024, rate=None, max_connections=None, fail_rate=0.0, seed=0):
+        self.size = size  # Bytes per file
+        self.rate = rate  # Bytes/s per connection, None for unlimited
+        self.max_connections = max_connections
+        self.fail_rate = fail_rate
+        self.random = random.Random(seed)
+        self.active = 0
+        self.requests = 0
+        self.throttled = 0
+        self.failed = 0
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        # Byte i of every file is i % 256, so ranged downloads can be checked
+        self._payload = bytes(range(256)) * (CHUNK_SIZE // 256 + 1)
+        self.httpd = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def url(self, name, ext="mp4"):
+        return f"{self.base_url}/media/{name}.{ext}"
+
+    def search(self, query, duration=None):
+        # Resolver search stand-in: every query "finds" a file of its own
+        slug = re.sub(r"[^\w.-]+", "-", query).strip("-") or "empty"
+        return {'id': slug, 'title': query, 'url': self.url(slug)}
+
+    def start(self, host="127.0.0.1", port=0):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_HEAD(self):
+                server.handle(self, head=True)
+
+            def do_GET(self):
+                server.handle(self, head=False)
+
+        self.httpd = QuietHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self.httpd:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def handle(self, request, head):
+        match = re.match(r"^/media/([\w.-]+)\.(\w+)$", request.path.split("?")[0])
+        if not match:
+            request.send_error(404)
+            return
+
+        with self._lock:
+            self.requests += 1
+            if not head and self.max_connections and self.active >= self.max_connections:
+                self.throttled += 1
+                status = 429
+            elif not head and self.fail_rate and self.random.random() < self.fail_rate:
+                self.failed += 1
+                status = 500
+            else:
+                status = 200
+                if not head:
+                    self.active += 1
+        if status != 200:
+            request.send_response(status)
+            request.send_header("Content-Length", "0")
+            request.end_headers()
+            return
+
+        try:
+            start, end = 0, self.size - 1
+            range_header = request.headers.get("Range")
+            if range_header:
+                range_match = re.match(r"bytes=(\d*)-(\d*)", range_header)
+                if range_match and range_match.group(1):
+                    start = int(range_match.group(1))
+                    if range_match.group(2):
+                        end = min(int(range_match.group(2)), self.size - 1)
+                if start >= self.size:
+                    request.send_response(416)
+                    request.send_header("Content-Range", f"bytes */{self.size}")
+                    request.send_header("Content-Length", "0")
+                    request.end_headers()
+                    return
+                request.send_response(206)
+                request.send_header("Content-Range", f"bytes {start}-{end}/{self.size}")
+            else:
+                request.send_response(200)
+            request.send_header("Content-Type", CONTENT_TYPES.get(match.group(2), "application/octet-stream"))
+            request.send_header("Accept-Ranges", "bytes")
+            request.send_header("Content-Length", str(end - start + 1))
+            request.end_headers()
+            if head:
+                return
+            self._send_body(request, start, end)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            if not head:
+                with self._lock:
+                    self.active -= 1
+
+    def _send_body(self, request, start, end):
+        remaining = end - start + 1
+        began = time.monotonic()
+        sent = 0
+        while remaining > 0:
+            offset = (start + sent) % 256
+            chunk = self._payload[offset:offset + min(CHUNK_SIZE, remaining)]
+            request.wfile.write(chunk)
+            remaining -= len(chunk)
+            sent += len(chunk)
+            with self._lock:
+                self.bytes_sent += len(chunk)
+            if self.rate:
+                # Sleep off whatever we are ahead of the per-connection rate
+                ahead = sent / self.rate - (time.monotonic() - began)
+                if ahead > 0:
+                    time.sleep(ahead)
+
+class FakeSpotify:
+    """Stub of spotify.PublicApi (spotapi) for iter_spotify_tracks / the engine.
+
+    playlist_info() and album_pages() page through containers registered
+    with add_playlist() / add_album() (which return their open.spotify.com
+    URLs) in SpotAPI's shapes, `page_size` items a page and `delay` seconds
+    per request; song_info() answers for any of their tracks. Track IDs
+    are "<container>t<index>", durations vary between 2 and 6 minutes.
+    Like the real API, album pages carry the album name and cover once,
+    not on each track. Covers are "<cover_base>/<album id>.png"; playlist
+    tracks come from ten made-up albums "<playlist>-a0".."<playlist>-a9".
+    """
+
+    def __init__(self, page_size=100, delay=0.0, cover_base="https://i.scdn.co/image"):
+        self.page_size = page_size
+        self.delay = delay
+        self.cover_base = cover_base
+        self.containers = {}  # playlist/album id -> (kind, track count)
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def add_playlist(self, playlist_id, tracks):
+        self.containers[playlist_id] = ("playlist", tracks)
+        return f"https://open.spotify.com/playlist/{playlist_id}"
+
+    def add_album(self, album_id, tracks):
+        self.containers[album_id] = ("album", tracks)
+        return f"https://open.spotify.com/album/{album_id}"
+
+    def track_url(self, container_id, i):
+        return f"https://open.spotify.com/track/{container_id}t{i}"
+
+    def _request(self):
+        with self._lock:
+            self.requests += 1
+        if self.delay:
+            time.sleep(self.delay)
+
+    def _pages(self, container_id):
+        if container_id not in self.containers:
+            raise Exception(f"{container_id} not found")
+        total = self.containers[container_id][1]
+        for offset in range(0, total, self.page_size):
+            self._request()
+            yield range(offset, min(offset + self.page_size, total))
+
+    def album(self, album_id):
+        # The album fields a track's albumOfTrack (or an albumUnion) has
+        return {
+            "name": f"Album {album_id}",
+            "coverArt": {"sources": [{"url": f"{self.cover_base}/{album_id}.png", "width": 640, "height": 640},
+                                     {"url": f"{self.cover_base}/{album_id}-small.png", "width": 64,
+                                      "height": 64}]},
+        }
+
+    def track(self, container_id, i):
+        kind = self.containers[container_id][0]
+        return {
+            "uri": f"spotify:track:{container_id}t{i}",
+            "name": f"{container_id} Track {i}",
+            "artists": {"items": [{"profile": {"name": f"Artist {i % 97}"}}]},
+            "duration": {"totalMilliseconds": (120 + i * 37 % 240) * 1000},
+            "trackNumber": i + 1 if kind == "album" else i // 10 + 1,
+        }
+
+    def album_of(self, container_id, i):
+        if self.containers[container_id][0] == "album":
+            return self.album(container_id)
+        return self.album(f"{container_id}-a{i % 10}")
+
+    def playlist_info(self, playlist_id):
+        for page in self._pages(playlist_id):
+            items = []
+            for i in page:
+                data = self.track(playlist_id, i)
+                data["trackDuration"] = data.pop("duration")
+                data["albumOfTrack"] = self.album_of(playlist_id, i)
+                items.append({"itemV2": {"data": data}})
+            yield {"items": items}
+
+    def album_pages(self, album_id):
+        for page in self._pages(album_id):
+            album = self.album(album_id)
+            album["tracksV2"] = {"totalCount": self.containers[album_id][1],
+                                 "items": [{"track": self.track(album_id, i)} for i in page]}
+            yield album
+
+    def song_info(self, track_id):
+        container_id, _, index = track_id.rpartition("t")
+        if container_id not in self.containers or not index.isdigit():
+            raise Exception(f"Track {track_id} not found")
+        self._request()
+        data = self.track(container_id, int(index))
+        data["firstArtist"] = data.pop("artists")
+        data["externalIds"] = {"isrc": f"ZZ{int(index):010d}"}
+        data["albumOfTrack"] = self.album_of(container_id, int(index))
+        return {"data": {"trackUnion": data}}
@@ -0,0 +1,586 @@
+"""The Tk window. downloader.py only imports this when it opens the GUI,
+so headless runs work on Pythons built without Tk."""
+import time
+import tkinter as tk
+from tkinter import ttk, messagebox, simpledialog
+import threading
+import os
+import contextlib
+
+# yt-dlp is only imported by the engine once the first job runs
+import install_ffmpeg
+from config import ConfigManager
+from history import HistoryManager
+from engine import DownloadEngine, ProgressTable, RowWindow, sanitize_folder_name
+from scheduler import PRIORITIES, DEFAULT_PRIORITY
+from retry import LABELS
+
+STARTUP_STARTED = time.perf_counter()  # Replaced by main() with when the process started
+STARTUP_TIMINGS = []
+
+PROGRESS_TICK_MS = 100  # UI refresh rate for the Downloads tab (10 Hz)
+HISTORY_PAGE_SIZE = 200  # History rows fetched per page while scrolling
+HISTORY_SEARCH_DELAY_MS = 300
+MAX_FAILED_ROWS = 500  # Newest failed jobs shown in the Failed tab, the count covers all of them
+
+@contextlib.contextmanager
+def startup_step(name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STARTUP_TIMINGS.append((name, time.perf_counter() - started))
+
+def print_startup_report():
+    print("Startup timings:")
+    for name, seconds in STARTUP_TIMINGS:
+        print(f"  {name:<28} {seconds * 1000:8.1f} ms")
+
+class SettingsDialog(tk.Toplevel):
+    def __init__(self, parent, config):
+        super().__init__(parent)
+        self.config = config
+        self.title("Spotify Settings")
+        self.geometry("400x250")
+        self.resizable(False, False)
+        
+        ttk.Label(self, text="Spotify API Credentials", font=("Segoe UI", 12, "bold")).pack(pady=10)
+        ttk.Label(self, text="Required for reliable playlist fetching.", font=("Segoe UI", 9)).pack()
+        ttk.Label(self, text="Get them at developer.spotify.com", font=("Segoe UI", 8, "italic"), foreground="blue", cursor="hand2").pack(pady=(0, 10))
+        
+        form_frame = ttk.Frame(self, padding=10)
+        form_frame.pack(fill=tk.X)
+        
+        ttk.Label(form_frame, text="Client ID:").pack(anchor=tk.W)
+        self.client_id = tk.StringVar(value=config.get("spotify_client_id", ""))
+        ttk.Entry(form_frame, textvariable=self.client_id, width=40).pack(fill=tk.X, pady=(0, 10))
+        
+        ttk.Label(form_frame, text="Client Secret:").pack(anchor=tk.W)
+        self.client_secret = tk.StringVar(value=config.get("spotify_client_secret", ""))
+        ttk.Entry(form_frame, textvariable=self.client_secret, show="*", width=40).pack(fill=tk.X, pady=(0, 10))
+        
+        btn_frame = ttk.Frame(self, padding=10)
+        btn_frame.pack(fill=tk.X, side=tk.BOTTOM)
+        ttk.Button(btn_frame, text="Save", command=self.save).pack(side=tk.RIGHT)
+        ttk.Button(btn_frame, text="Cancel", command=self.destroy).pack(side=tk.RIGHT, padx=5)
+
+    def save(self):
+        self.config.set("spotify_client_id", self.client_id.get().strip())
+        self.config.set("spotify_client_secret", self.client_secret.get().strip())
+        messagebox.showinfo("Saved", "Settings saved!")
+        self.destroy()
+
+class DownloaderApp:
+    def __init__(self, root, profile_startup=False):
+        self.root = root
+        self.root.title("Advanced YouTube Downloader")
+        self.root.geometry("900x600")
+        self.profile_startup = profile_startup
+
+        # Data
+        with startup_step("config + history"):
+            self.config_manager = ConfigManager()
+            self.history_manager = HistoryManager()
+        with startup_step("engine"):
+            self.engine = DownloadEngine(self.history_manager, config=self.config_manager)
+            self.progress_table = ProgressTable()
+            self.engine.subscribe(self.progress_table.push)
+        # Decides which jobs get a tree_active row (see engine.RowWindow)
+        self.row_window = RowWindow(self)
+        
+        # Style
+        self.style = ttk.Style()
+        self.style.configure("TButton", font=("Segoe UI", 10))
+        self.style.configure("TLabel", font=("Segoe UI", 10))
+        self.style.configure("Treeview.Heading", font=("Segoe UI", 10, "bold"))
+        self.style.configure("Treeview", rowheight=25)
+
+        # UI Layout
+        with startup_step("widgets"):
+            self.create_widgets()
+        
+        # Handle Window Close
+        self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
+
+        # Single periodic tick applies all queued engine events in one batch
+        self.root.after(PROGRESS_TICK_MS, self.ui_tick)
+
+        # Everything else waits until the window is on screen
+        self.root.after_idle(self.finish_startup)
+
+    def finish_startup(self):
+        STARTUP_TIMINGS.append(("first draw (total)", time.perf_counter() - STARTUP_STARTED))
+        if self.profile_startup:
+            with startup_step("dependency check"):
+                install_ffmpeg.find_tools()
+            with startup_step("yt_dlp import (first job)"):
+                import yt_dlp
+            print_startup_report()
+            self.engine.close()
+            self.root.destroy()
+            return
+
+        # Check Dependencies (Auto-Setup) off the UI thread
+        threading.Thread(target=self.check_dependencies, daemon=True).start()
+
+    def check_dependencies(self):
+        # Then pick up whatever the last session left unfinished; only the
+        # setup dialog (if FFmpeg is missing) has to go through the UI thread
+        if install_ffmpeg.find_tools() is None:
+            self.root.after(0, self.setup_then_resume)
+        else:
+            self.engine.resume()
+
+    def setup_then_resume(self):
+        self.perform_auto_setup()
+        self.engine.resume()
+
+    def on_closing(self):
+        if messagebox.askokcancel("Quit", "Do you want to quit?"):
+            # Commit batched history entries before the hard exit. Unfinished
+            # jobs are already saved and resume on the next start.
+            self.engine.close()
+            # Force kill process to ensure all threads/ffmpeg stop
+            self.root.destroy()
+            os._exit(0)
+
+    def perform_auto_setup(self):
+        setup_win = tk.Toplevel(self.root)
+        setup_win.title("First Time Setup")
+        setup_win.geometry("400x170")
+        setup_win.resizable(False, False)
+        
+        # Make modal
+        setup_win.transient(self.root)
+        setup_win.grab_set()
+        
+        ttk.Label(setup_win, text="Installing Dependencies...", font=("Segoe UI", 12, "bold")).pack(pady=(20, 10))
+        status_var = tk.StringVar(value="Downloading FFmpeg (Required for Media Processing)")
+        ttk.Label(setup_win, textvariable=status_var, justify="center").pack(pady=5)
+        
+        progress = ttk.Progressbar(setup_win, mode='determinate', maximum=100)
+        progress.pack(fill=tk.X, padx=30, pady=10)
+        detail_var = tk.StringVar()
+        ttk.Label(setup_win, textvariable=detail_var, foreground="gray").pack()
+
+        last_percent = [-1]
+
+        # Tk isn't thread-safe, so the worker hands every UI update to the main loop
+        def on_status(text):
+            self.root.after(0, status_var.set, text)
+
+        def on_progress(done, total):
+            percent = done * 100 // total if total else 0
+            if percent == last_percent[0]:
+                return
+            last_percent[0] = percent
+            def apply():
+                progress['value'] = percent
+                if total:
+                    detail_var.set(f"{done / 1048576:.1f} / {total / 1048576:.1f} MB")
+                else:
+                    detail_var.set(f"{done / 1048576:.1f} MB")
+            self.root.after(0, apply)
+
+        def finish(error):
+            if error:
+                messagebox.showerror("Setup Error", f"Failed to install FFmpeg:\n{error}")
+            else:
+                messagebox.showinfo("Setup Complete", "Dependencies installed successfully!")
+            setup_win.destroy()
+
+        def download_thread():
+            try:
+                install_ffmpeg.install(progress=on_progress, status=on_status)
+                error = None
+            except Exception as e:
+                error = str(e)
+            self.root.after(0, finish, error)
+        
+        threading.Thread(target=download_thread, daemon=True).start()
+        
+        # Wait for window to close before continuing main init? 
+        # Actually tk.Tk() is running, so we just wait.
+        self.root.wait_window(setup_win)
+        
+    def create_widgets(self):
+        # Top Bar for Settings
+        top_bar = ttk.Frame(self.root, padding=5)
+        top_bar.pack(fill=tk.X)
+        ttk.Button(top_bar, text="Spotify Settings", command=self.open_settings).pack(side=tk.RIGHT, padx=5)
+
+        # Notebook (Tabs)
+        self.notebook = ttk.Notebook(self.root)
+        self.notebook.pack(fill=tk.BOTH, expand=True, padx=10, pady=(0,10))
+
+        # Tab 1: Downloads
+        self.tab_downloads = ttk.Frame(self.notebook)
+        self.notebook.add(self.tab_downloads, text="  Downloads  ")
+        self.setup_downloads_tab()
+
+        # Tab 2: History
+        self.tab_history = ttk.Frame(self.notebook)
+        self.notebook.add(self.tab_history, text="  History  ")
+        self.setup_history_tab()
+
+        # Tab 3: Failed (jobs that gave up, kept in jobs.db across runs)
+        self.tab_failed = ttk.Frame(self.notebook)
+        self.notebook.add(self.tab_failed, text="  Failed  ")
+        self.setup_failed_tab()
+    
+    def open_settings(self):
+        SettingsDialog(self.root, self.config_manager)
+
+    def setup_downloads_tab(self):
+        # -- Top Input Section --
+        input_frame = ttk.Frame(self.tab_downloads, padding="10")
+        input_frame.pack(fill=tk.X)
+        
+        # Row 1: URL
+        row1 = ttk.Frame(input_frame)
+        row1.pack(fill=tk.X, pady=(0, 10))
+        
+        ttk.Label(row1, text="URL:").pack(side=tk.LEFT)
+        self.url_var = tk.StringVar()
+        entry = ttk.Entry(row1, textvariable=self.url_var)
+        entry.pack(side=tk.LEFT, padx=10, fill=tk.X, expand=True)
+
+        # Row 2: Options
+        row2 = ttk.Frame(input_frame)
+        row2.pack(fill=tk.X)
+
+        # Format Selector
+        ttk.Label(row2, text="Format:").pack(side=tk.LEFT)
+        self.format_var = tk.StringVar(value="mp4")
+        ttk.Radiobutton(row2, text="Video (MP4)", variable=self.format_var, value="mp4").pack(side=tk.LEFT, padx=5)
+        ttk.Radiobutton(row2, text="Audio (MP3)", variable=self.format_var, value="mp3").pack(side=tk.LEFT, padx=5)
+        
+        # Folder Name Input
+        ttk.Separator(row2, orient=tk.VERTICAL).pack(side=tk.LEFT, fill=tk.Y, padx=15)
+        ttk.Label(row2, text="Save to Folder:").pack(side=tk.LEFT)
+        self.folder_var = tk.StringVar()
+        folder_entry = ttk.Entry(row2, textvariable=self.folder_var, width=15)
+        folder_entry.pack(side=tk.LEFT, padx=5)
+        ttk.Label(row2, text="(Optional)", foreground="gray").pack(side=tk.LEFT)
+
+        # Priority (share of the bandwidth when max_bandwidth is set)
+        ttk.Separator(row2, orient=tk.VERTICAL).pack(side=tk.LEFT, fill=tk.Y, padx=15)
+        ttk.Label(row2, text="Priority:").pack(side=tk.LEFT)
+        self.priority_var = tk.StringVar(value=DEFAULT_PRIORITY)
+        ttk.Combobox(row2, textvariable=self.priority_var, values=list(PRIORITIES), state="readonly",
+                     width=8).pack(side=tk.LEFT, padx=5)
+
+        # Add Button
+        btn_add = ttk.Button(row2, text="Add to Queue", command=self.add_to_queue)
+        btn_add.pack(side=tk.RIGHT, padx=10)
+
+        # -- Active Downloads List --
+        self.list_frame = list_frame = ttk.Labelframe(self.tab_downloads, text="Queue & Active Downloads", padding="10")
+        list_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=(0,10))
+
+        cols = ("ID", "Title", "Folder", "Progress", "Status", "Speed", "Size")
+        self.tree_active = ttk.Treeview(list_frame, columns=cols, show="headings", selectmode="browse")
+        
+        self.tree_active.heading("ID", text="ID")
+        self.tree_active.column("ID", width=40, anchor="center")
+        
+        self.tree_active.heading("Title", text="Title/URL")
+        self.tree_active.column("Title", width=250)
+        
+        self.tree_active.heading("Folder", text="Folder")
+        self.tree_active.column("Folder", width=80, anchor="center")
+        
+        self.tree_active.heading("Progress", text="Progress")
+        self.tree_active.column("Progress", width=80, anchor="center")
+        
+        self.tree_active.heading("Status", text="Status")
+        self.tree_active.column("Status", width=120, anchor="center")
+        
+        self.tree_active.heading("Speed", text="Speed")
+        self.tree_active.column("Speed", width=80, anchor="center")
+        
+        self.tree_active.heading("Size", text="Size")
+        self.tree_active.column("Size", width=70, anchor="center")
+
+        scrollbar = ttk.Scrollbar(list_frame, orient=tk.VERTICAL, command=self.tree_active.yview)
+        self.tree_active.configure(yscroll=scrollbar.set)
+        
+        self.tree_active.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+    def setup_history_tab(self):
+        # -- Toolkit Bar --
+        tool_frame = ttk.Frame(self.tab_history, padding="10")
+        tool_frame.pack(fill=tk.X)
+
+        ttk.Button(tool_frame, text="Refresh", command=self.refresh_history_ui).pack(side=tk.LEFT, padx=5)
+        ttk.Button(tool_frame, text="Open Downloads Folder", command=self.open_downloads_folder).pack(side=tk.LEFT, padx=5)
+        ttk.Button(tool_frame, text="Clear History", command=self.clear_history).pack(side=tk.RIGHT, padx=5)
+
+        # Search is run by the history store (SQL), debounced while typing
+        ttk.Label(tool_frame, text="Search:").pack(side=tk.LEFT, padx=(15, 0))
+        self.history_search_var = tk.StringVar()
+        ttk.Entry(tool_frame, textvariable=self.history_search_var, width=30).pack(side=tk.LEFT, padx=5)
+        self.history_search_var.trace_add("write", self.on_history_search)
+        self.history_search_after = None
+
+        # Paging state: rows between oldest_id and newest_id are loaded
+        self.history_newest_id = 0
+        self.history_oldest_id = None
+        self.history_exhausted = False
+        self.history_page_scheduled = False
+
+        # -- History List --
+        hist_frame = ttk.Frame(self.tab_history, padding="10")
+        hist_frame.pack(fill=tk.BOTH, expand=True)
+
+        cols = ("Date", "Title", "Format", "Path")
+        self.tree_history = ttk.Treeview(hist_frame, columns=cols, show="headings", selectmode="browse")
+
+        self.tree_history.heading("Date", text="Date")
+        self.tree_history.column("Date", width=150)
+        
+        self.tree_history.heading("Title", text="Title")
+        self.tree_history.column("Title", width=400)
+        
+        self.tree_history.heading("Format", text="Format")
+        self.tree_history.column("Format", width=80, anchor="center")
+
+        self.tree_history.heading("Path", text="Location")
+        self.tree_history.column("Path", width=200)
+
+        scrollbar = ttk.Scrollbar(hist_frame, orient=tk.VERTICAL, command=self.tree_history.yview)
+        self.tree_history.configure(yscroll=lambda first, last: self.on_history_scroll(scrollbar, first, last))
+
+        self.tree_history.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        
+        self.refresh_history_ui()
+
+    def setup_failed_tab(self):
+        tool_frame = ttk.Frame(self.tab_failed, padding="10")
+        tool_frame.pack(fill=tk.X)
+
+        ttk.Button(tool_frame, text="Retry Selected", command=self.retry_selected).pack(side=tk.LEFT, padx=5)
+        ttk.Button(tool_frame, text="Retry All", command=self.retry_all_failed).pack(side=tk.LEFT, padx=5)
+        ttk.Button(tool_frame, text="Refresh", command=self.refresh_failed_ui).pack(side=tk.LEFT, padx=5)
+        ttk.Button(tool_frame, text="Clear List", command=self.clear_failed).pack(side=tk.RIGHT, padx=5)
+
+        failed_frame = ttk.Frame(self.tab_failed, padding="10")
+        failed_frame.pack(fill=tk.BOTH, expand=True)
+
+        cols = ("ID", "Title", "Reason", "Tries", "Error")
+        self.tree_failed = ttk.Treeview(failed_frame, columns=cols, show="headings", selectmode="extended")
+
+        self.tree_failed.heading("ID", text="ID")
+        self.tree_failed.column("ID", width=40, anchor="center")
+
+        self.tree_failed.heading("Title", text="Title/URL")
+        self.tree_failed.column("Title", width=250)
+
+        self.tree_failed.heading("Reason", text="Reason")
+        self.tree_failed.column("Reason", width=100, anchor="center")
+
+        self.tree_failed.heading("Tries", text="Tries")
+        self.tree_failed.column("Tries", width=50, anchor="center")
+
+        self.tree_failed.heading("Error", text="Error")
+        self.tree_failed.column("Error", width=350)
+
+        scrollbar = ttk.Scrollbar(failed_frame, orient=tk.VERTICAL, command=self.tree_failed.yview)
+        self.tree_failed.configure(yscroll=scrollbar.set)
+
+        self.tree_failed.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        # Double-click a row to retry it
+        self.tree_failed.bind("<Double-1>", lambda event: self.retry_selected())
+
+        self.refresh_failed_ui()
+
+    def refresh_failed_ui(self):
+        # Full reload from jobs.db (start-up and the buttons); while running,
+        # ui_tick only adds and drops the rows of jobs that just finished
+        self.tree_failed.delete(*self.tree_failed.get_children())
+        for row in self.engine.failed_jobs(limit=MAX_FAILED_ROWS):
+            label = LABELS.get(row["error_class"] or "", "Error")
+            self.tree_failed.insert("", "end", iid=str(row["id"]), values=(
+                row["id"], row["title"] or row["url"], label, row["attempts"] or 1, row["error"] or ""))
+        self.failed_count = self.engine.job_store.count_failed()
+        self.update_failed_tab()
+
+    def update_failed_rows(self, failed, finished):
+        # Newly failed jobs go on top (at most MAX_FAILED_ROWS are kept),
+        # jobs that went through on a retry leave the list. The count comes
+        # from jobs.db, the list may not hold every failed job.
+        for job in failed:
+            values = (job.id, job.title, LABELS.get(job.error_class or "", "Error"), job.attempts or 1,
+                      job.error or "")
+            if self.tree_failed.exists(job.id):
+                self.tree_failed.item(job.id, values=values)
+                self.tree_failed.move(job.id, "", 0)
+            else:
+                self.tree_failed.insert("", 0, iid=job.id, values=values)
+        for job in finished:
+            if self.tree_failed.exists(job.id):
+                self.tree_failed.delete(job.id)
+        rows = self.tree_failed.get_children()
+        if len(rows) > MAX_FAILED_ROWS:
+            self.tree_failed.delete(*rows[MAX_FAILED_ROWS:])
+        self.failed_count = self.engine.job_store.count_failed()
+        self.update_failed_tab()
+
+    def update_failed_tab(self):
+        count = self.failed_count
+        self.notebook.tab(self.tab_failed, text=f"  Failed ({count})  " if count else "  Failed  ")
+
+    def retry_selected(self):
+        selected = self.tree_failed.selection()
+        if selected:
+            self.engine.retry_failed(selected)
+            self.refresh_failed_ui()
+
+    def retry_all_failed(self):
+        self.engine.retry_failed()
+        self.refresh_failed_ui()
+
+    def clear_failed(self):
+        if messagebox.askyesno("Confirm", "Forget all failed downloads?"):
+            self.engine.job_store.clear_failed()
+            self.refresh_failed_ui()
+
+    def add_to_queue(self):
+        url = self.url_var.get().strip()
+        fmt = self.format_var.get()
+        folder_name = self.folder_var.get().strip()
+        
+        # Basic sanitization for folder name
+        if folder_name:
+            folder_name = sanitize_folder_name(folder_name)
+        
+        if not url:
+            messagebox.showwarning("Warning", "Please enter a URL")
+            return
+            
+        # Clear entry (Optional: keep folder name so user can add multiple to same folder easily?)
+        # Let's keep the folder name, clear only URL
+        self.url_var.set("")
+        
+        # Several links can be pasted at once; Spotify links are resolved by
+        # the engine into one job per track
+        self.engine.add_links(url, fmt, folder_name, priority=self.priority_var.get())
+
+    def ui_tick(self):
+        # Workers only write into progress_table; this is the one place
+        # that touches tree_active, at most once per changed row per tick.
+        events, dirty = self.progress_table.drain()
+        before = len(self.row_window.waiting)
+        self.row_window.apply(events, dirty)
+        history_changed = any(event == "completed" for event, job, changes in events)
+        failed = [job for event, job, changes in events if event == "failed"]
+        finished = [job for event, job, changes in events if event in ("completed", "skipped")]
+
+        waiting = len(self.row_window.waiting)
+        if waiting != before:
+            self.list_frame.configure(text=f"Queue & Active Downloads ({waiting} more queued)" if waiting
+                                      else "Queue & Active Downloads")
+        if history_changed:
+            self.append_new_history()
+        if failed or (finished and self.failed_count):
+            self.update_failed_rows(failed, finished)
+
+        self.root.after(PROGRESS_TICK_MS, self.ui_tick)
+
+    # Row callbacks for row_window
+
+    def insert_row(self, job, values):
+        self.tree_active.insert("", "end", iid=job.id, values=values)
+
+    def update_row(self, job_id, values):
+        if self.tree_active.exists(job_id):
+            self.tree_active.item(job_id, values=values)
+
+    def delete_row(self, job_id):
+        if self.tree_active.exists(job_id):
+            self.tree_active.delete(job_id)
+
+    def refresh_history_ui(self):
+        # Reload from the newest entry (Refresh button, search, clear)
+        self.tree_history.delete(*self.tree_history.get_children())
+        self.history_newest_id = 0
+        self.history_oldest_id = None
+        self.history_exhausted = False
+        self.load_history_page()
+
+    def history_search_term(self):
+        return self.history_search_var.get().strip() or None
+
+    def history_row_values(self, item):
+        return (item.get('date'), item.get('title'), item.get('format'), item.get('path'))
+
+    def load_history_page(self):
+        # Append the next page of older entries below what is already shown
+        self.history_page_scheduled = False
+        if self.history_exhausted:
+            return
+        entries = self.history_manager.get_entries(limit=HISTORY_PAGE_SIZE,
+                                                   before_id=self.history_oldest_id,
+                                                   search=self.history_search_term())
+        for item in entries:
+            self.tree_history.insert("", "end", iid=f"h{item['id']}", values=self.history_row_values(item))
+        if entries:
+            self.history_newest_id = max(self.history_newest_id, entries[0]['id'])
+            self.history_oldest_id = entries[-1]['id']
+        if len(entries) < HISTORY_PAGE_SIZE:
+            self.history_exhausted = True
+
+    def append_new_history(self):
+        # Insert only entries written since the last look, on top
+        entries = self.history_manager.get_entries(after_id=self.history_newest_id,
+                                                   search=self.history_search_term())
+        for item in reversed(entries):
+            self.tree_history.insert("", 0, iid=f"h{item['id']}", values=self.history_row_values(item))
+        if entries:
+            self.history_newest_id = entries[0]['id']
+            if self.history_oldest_id is None:
+                self.history_oldest_id = entries[-1]['id']
+
+    def on_history_scroll(self, scrollbar, first, last):
+        scrollbar.set(first, last)
+        # Near the bottom: lazily fetch the next page (outside the scroll callback)
+        if float(last) >= 0.9 and not self.history_exhausted and not self.history_page_scheduled:
+            self.history_page_scheduled = True
+            self.root.after_idle(self.load_history_page)
+
+    def on_history_search(self, *args):
+        if self.history_search_after:
+            self.root.after_cancel(self.history_search_after)
+        self.history_search_after = self.root.after(HISTORY_SEARCH_DELAY_MS, self.refresh_history_ui)
+
+    def clear_history(self):
+        if messagebox.askyesno("Confirm", "Clear download history?"):
+            self.history_manager.clear()
+            self.refresh_history_ui()
+
+    def open_downloads_folder(self):
+        download_dir = os.path.join(os.getcwd(), 'downloads')
+        if not os.path.exists(download_dir):
+            os.makedirs(download_dir)
+        os.startfile(download_dir)
+
+def main(started=None, profile_startup=False):
+    global STARTUP_STARTED
+    if started is not None:
+        STARTUP_STARTED = started
+    STARTUP_TIMINGS.append(("imports", time.perf_counter() - STARTUP_STARTED))
+
+    with startup_step("tk init"):
+        root = tk.Tk()
+    # High DPI aware
+    try:
+        from ctypes import windll
+        windll.shcore.SetProcessDpiAwareness(1)
+    except:
+        pass
+        
+    app = DownloaderApp(root, profile_startup=profile_startup)
+    root.mainloop()
@@ -0,0 +1,191 @@
+import os
+import json
+import time
+import atexit
+import sqlite3
+import threading
+
+HISTORY_DB = "history.db"
+HISTORY_FILE = "history.json"  # Legacy store, migrated into HISTORY_DB on first run
+
+# Completed downloads are committed in batches: whichever comes first
+HISTORY_BATCH_SIZE = 25
+HISTORY_FLUSH_SECONDS = 2.0
+
+HISTORY_COLUMNS = ("date", "title", "url", "format", "path")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    date TEXT NOT NULL,
+    title TEXT,
+    url TEXT,
+    format TEXT,
+    path TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_history_url ON history(url);
+CREATE INDEX IF NOT EXISTS idx_history_date ON history(date);
+CREATE INDEX IF NOT EXISTS idx_history_title ON history(title COLLATE NOCASE);
+
+-- Identity cache for skip-already-downloaded: one row per (key, format),
+-- key being e.g. "youtube:<video id>" or "query:<artist - title>"
+CREATE TABLE IF NOT EXISTS downloaded (
+    key TEXT NOT NULL,
+    format TEXT NOT NULL,
+    filepath TEXT,
+    title TEXT,
+    date TEXT,
+    PRIMARY KEY (key, format, filepath)
+);
+"""
+
+class HistoryManager:
+    """Download history in SQLite.
+
+    add_entry() is safe to call from any worker thread. Entries are buffered
+    and committed in batches (HISTORY_BATCH_SIZE / HISTORY_FLUSH_SECONDS);
+    every read flushes first so callers always see their own writes.
+    """
+
+    def __init__(self, db_path=HISTORY_DB, legacy_file=HISTORY_FILE):
+        self.db_path = db_path
+        self._lock = threading.RLock()
+        self._pending = []
+        self._pending_downloaded = []
+        self._last_flush = time.monotonic()
+        self._closed = False
+
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+        self.migrate_json(legacy_file)
+
+        # Background flusher so a quiet tail of a batch doesn't sit in memory
+        self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+        self._flusher.start()
+        atexit.register(self.close)
+
+    def migrate_json(self, legacy_file):
+        # One-time import of the old history.json (newest-first list)
+        if not legacy_file or not os.path.exists(legacy_file):
+            return
+        try:
+            with open(legacy_file, 'r') as f:
+                entries = json.load(f)
+        except Exception as e:
+            print(f"History migration skipped, could not read {legacy_file}: {e}")
+            return
+
+        with self._lock:
+            self.conn.executemany(
+                "INSERT INTO history (date, title, url, format, path) VALUES (?, ?, ?, ?, ?)",
+                [tuple(entry.get(col) for col in HISTORY_COLUMNS) for entry in reversed(entries)
+                 if isinstance(entry, dict)])
+            self.conn.commit()
+        os.replace(legacy_file, legacy_file + ".migrated")
+        print(f"Migrated {len(entries)} history entries from {legacy_file}")
+
+    def add_entry(self, entry):
+        # Entry: {date, title, url, format, path}
+        with self._lock:
+            self._pending.append(tuple(entry.get(col) for col in HISTORY_COLUMNS))
+            if (len(self._pending) >= HISTORY_BATCH_SIZE or
+                    time.monotonic() - self._last_flush >= HISTORY_FLUSH_SECONDS):
+                self.flush()
+
+    def mark_downloaded(self, keys, fmt, filepath, title):
+        # Batched together with add_entry()
+        date = time.strftime("%Y-%m-%d %H:%M:%S")
+        with self._lock:
+            self._pending_downloaded.extend((key, fmt, filepath, title, date) for key in keys if key)
+
+    def find_downloaded(self, keys, fmt, directory=None):
+        # Returns a cached row for any of keys whose file still exists on disk
+        # (and, if given, lives in directory)
+        keys = [key for key in keys if key]
+        if not keys:
+            return None
+        with self._lock:
+            self.flush()
+            rows = self.conn.execute(
+                "SELECT key, format, filepath, title, date FROM downloaded WHERE format = ? AND key IN (%s)"
+                % ",".join("?" * len(keys)), [fmt] + keys).fetchall()
+        for row in rows:
+            filepath = row["filepath"]
+            if not filepath or not os.path.exists(filepath):
+                continue
+            if directory and os.path.normcase(os.path.dirname(os.path.abspath(filepath))) != \
+                    os.path.normcase(os.path.abspath(directory)):
+                continue
+            return dict(row)
+        return None
+
+    def flush(self):
+        with self._lock:
+            self._last_flush = time.monotonic()
+            if self._closed or not (self._pending or self._pending_downloaded):
+                return
+            pending, self._pending = self._pending, []
+            downloaded, self._pending_downloaded = self._pending_downloaded, []
+            self.conn.executemany(
+                "INSERT INTO history (date, title, url, format, path) VALUES (?, ?, ?, ?, ?)",
+                pending)
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO downloaded (key, format, filepath, title, date) VALUES (?, ?, ?, ?, ?)",
+                downloaded)
+            self.conn.commit()
+
+    def _flush_loop(self):
+        while not self._closed:
+            time.sleep(HISTORY_FLUSH_SECONDS)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"History flush error: {e}")
+
+    def get_entries(self, limit=None, before_id=None, after_id=None, search=None):
+        # Newest first. before_id / after_id page by row id (keyset paging, so
+        # the cost doesn't grow with how far back the caller has scrolled);
+        # search matches title or url.
+        where, params = [], []
+        if before_id is not None:
+            where.append("id < ?")
+            params.append(before_id)
+        if after_id is not None:
+            where.append("id > ?")
+            params.append(after_id)
+        if search:
+            pattern = "%" + search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            where.append("(title LIKE ? ESCAPE '\\' OR url LIKE ? ESCAPE '\\')")
+            params.extend([pattern, pattern])
+        sql = "SELECT id, date, title, url, format, path FROM history"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY id DESC LIMIT ?"
+        params.append(-1 if limit is None else limit)
+
+        with self._lock:
+            self.flush()
+            rows = self.conn.execute(sql, params).fetchall()
+        return [dict(row) for row in rows]
+
+    def clear(self):
+        # Also forgets what was downloaded, so everything can be fetched again
+        with self._lock:
+            self._pending = []
+            self._pending_downloaded = []
+            self.conn.execute("DELETE FROM history")
+            self.conn.execute("DELETE FROM downloaded")
+            self.conn.commit()
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self.flush()
+            self._closed = True
+            self.conn.close()
@@ -0,0 +1,224 @@
+"""FFmpeg bootstrap.
+
+Downloads a static FFmpeg build into a versioned tools/ directory:
+streamed to disk in chunks, resumable, hash-checked, and with only the
+ffmpeg/ffprobe binaries extracted. find_tools() is just a few stat calls,
+so it can run on every startup.
+
+    python install_ffmpeg.py
+"""
+import os
+import sys
+import json
+import shutil
+import hashlib
+import tarfile
+import zipfile
+import platform
+
+TOOLS_DIR = "tools"
+MANIFEST_FILE = os.path.join(TOOLS_DIR, "ffmpeg.json")
+CHUNK_SIZE = 1024 * 1024
+
+SOURCES = {
+    "windows": {
+        "url": "https://www.gyan.dev/ffmpeg/builds/ffmpeg-release-essentials.zip",
+        "checksum_url": "https://www.gyan.dev/ffmpeg/builds/ffmpeg-release-essentials.zip.sha256",
+        "hash": "sha256",
+        "version_url": "https://www.gyan.dev/ffmpeg/builds/release-version",
+    },
+    "linux-amd64": {
+        "url": "https://johnvansickle.com/ffmpeg/releases/ffmpeg-release-amd64-static.tar.xz",
+        "checksum_url": "https://johnvansickle.com/ffmpeg/releases/ffmpeg-release-amd64-static.tar.xz.md5",
+        "hash": "md5",
+        "version_url": None,
+    },
+    "linux-arm64": {
+        "url": "https://johnvansickle.com/ffmpeg/releases/ffmpeg-release-arm64-static.tar.xz",
+        "checksum_url": "https://johnvansickle.com/ffmpeg/releases/ffmpeg-release-arm64-static.tar.xz.md5",
+        "hash": "md5",
+        "version_url": None,
+    },
+}
+
+def binary_names():
+    if sys.platform == "win32":
+        return ("ffmpeg.exe", "ffprobe.exe")
+    return ("ffmpeg", "ffprobe")
+
+def platform_key():
+    if sys.platform == "win32":
+        return "windows"
+    if sys.platform.startswith("linux"):
+        machine = platform.machine().lower()
+        if machine in ("x86_64", "amd64"):
+            return "linux-amd64"
+        if machine in ("aarch64", "arm64"):
+            return "linux-arm64"
+    return None
+
+def _has_binaries(directory):
+    return all(os.path.isfile(os.path.join(directory, name)) for name in binary_names())
+
+def find_tools():
+    """Directory holding both ffmpeg and ffprobe, or None.
+
+    Checked in order: the installed version from the manifest, binaries
+    left in the working directory by older versions of the app, then PATH.
+    """
+    try:
+        with open(MANIFEST_FILE, 'r') as f:
+            directory = json.load(f).get("path")
+        if directory and _has_binaries(directory):
+            return os.path.abspath(directory)
+    except (OSError, ValueError):
+        pass
+
+    if _has_binaries("."):
+        return os.path.abspath(".")
+
+    ffmpeg, ffprobe = (shutil.which(name) for name in binary_names())
+    if ffmpeg and ffprobe:
+        return os.path.dirname(ffmpeg)
+    return None
+
+def find_ffmpeg():
+    directory = find_tools()
+    if directory:
+        return os.path.join(directory, binary_names()[0])
+    return "ffmpeg"
+
+def download(url, dest, progress=None):
+    # Streams url into dest, continuing from dest + ".part" if an earlier
+    # attempt was interrupted. progress(done_bytes, total_bytes or None).
+    import requests
+
+    part = dest + ".part"
+    offset = os.path.getsize(part) if os.path.exists(part) else 0
+    headers = {"Range": f"bytes={offset}-"} if offset else {}
+
+    with requests.get(url, stream=True, headers=headers, timeout=30) as r:
+        if r.status_code == 416:
+            # The part file is already complete
+            os.replace(part, dest)
+            return dest
+        r.raise_for_status()
+        if r.status_code != 206:
+            offset = 0  # Server ignored the range, start over
+        length = r.headers.get("Content-Length")
+        total = offset + int(length) if length else None
+
+        done = offset
+        with open(part, "ab" if offset else "wb") as f:
+            for chunk in r.iter_content(chunk_size=CHUNK_SIZE):
+                if not chunk:
+                    continue
+                f.write(chunk)
+                done += len(chunk)
+                if progress:
+                    progress(done, total)
+
+    os.replace(part, dest)
+    return dest
+
+def fetch_text(url):
+    import requests
+    r = requests.get(url, timeout=30)
+    r.raise_for_status()
+    return r.text.strip()
+
+def file_hash(path, algorithm):
+    h = hashlib.new(algorithm)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def extract_binaries(archive, target_dir):
+    # Pulls just ffmpeg/ffprobe out of the archive, wherever they sit in it
+    wanted = set(binary_names())
+    os.makedirs(target_dir, exist_ok=True)
+    found = set()
+
+    if archive.endswith(".zip"):
+        with zipfile.ZipFile(archive) as z:
+            for info in z.infolist():
+                name = os.path.basename(info.filename)
+                if name in wanted and not info.is_dir():
+                    with z.open(info) as src, open(os.path.join(target_dir, name), "wb") as dst:
+                        shutil.copyfileobj(src, dst, CHUNK_SIZE)
+                    found.add(name)
+    else:
+        with tarfile.open(archive) as t:
+            for member in t:
+                name = os.path.basename(member.name)
+                if name in wanted and member.isfile():
+                    with t.extractfile(member) as src, open(os.path.join(target_dir, name), "wb") as dst:
+                        shutil.copyfileobj(src, dst, CHUNK_SIZE)
+                    found.add(name)
+
+    if found != wanted:
+        raise Exception(f"Could not find {', '.join(sorted(wanted - found))} in the downloaded archive.")
+    if sys.platform != "win32":
+        for name in wanted:
+            os.chmod(os.path.join(target_dir, name), 0o755)
+
+def install(progress=None, status=None):
+    """Download and unpack FFmpeg into tools/ffmpeg-<version>; returns that directory.
+
+    status(text) gets short step descriptions, progress is passed to download().
+    """
+    key = platform_key()
+    if key is None:
+        raise Exception("No FFmpeg build for this platform, please install ffmpeg and ffprobe on PATH.")
+    source = SOURCES[key]
+    os.makedirs(TOOLS_DIR, exist_ok=True)
+
+    if status: status("Checking latest version...")
+    expected = fetch_text(source["checksum_url"]).split()[0].lower()
+    version = fetch_text(source["version_url"]) if source["version_url"] else expected[:12]
+    target_dir = os.path.join(TOOLS_DIR, f"ffmpeg-{version}")
+
+    if not _has_binaries(target_dir):
+        archive = os.path.join(TOOLS_DIR, source["url"].rsplit("/", 1)[1])
+        if status: status(f"Downloading FFmpeg {version}...")
+        download(source["url"], archive, progress)
+
+        if status: status("Verifying download...")
+        actual = file_hash(archive, source["hash"])
+        if actual != expected:
+            os.remove(archive)
+            raise Exception(f"Checksum mismatch for FFmpeg download ({source['hash']} {actual} != {expected}).")
+
+        if status: status("Extracting...")
+        extract_binaries(archive, target_dir)
+        os.remove(archive)
+
+    with open(MANIFEST_FILE, "w") as f:
+        json.dump({"version": version, "path": target_dir}, f, indent=4)
+
+    # Older versions of the tools are no longer referenced
+    for name in os.listdir(TOOLS_DIR):
+        path = os.path.join(TOOLS_DIR, name)
+        if name.startswith("ffmpeg-") and os.path.isdir(path) and path != target_dir:
+            shutil.rmtree(path, ignore_errors=True)
+    return target_dir
+
+if __name__ == "__main__":
+    existing = find_tools()
+    if existing and "--force" not in sys.argv:
+        print(f"FFmpeg found in {existing}")
+        sys.exit(0)
+
+    def print_progress(done, total):
+        if total:
+            print(f"\r  {done * 100 // total:3d}%  {done / 1048576:.1f} / {total / 1048576:.1f} MiB", end="", flush=True)
+        else:
+            print(f"\r  {done / 1048576:.1f} MiB", end="", flush=True)
+
+    try:
+        directory = install(progress=print_progress, status=lambda text: print(f"\n{text}" if text else ""))
+    except Exception as e:
+        print(f"\nFFmpeg setup failed: {e}")
+        sys.exit(1)
+    print(f"\nFFmpeg installed in {directory}")
@@ -0,0 +1,125 @@
+import json
+import time
+import sqlite3
+import threading
+
+JOBS_DB = "jobs.db"
+
+# Persisted job states. Job.status stays free-form display text
+# ("Downloading", "Found 120 songs..."), state is what resume looks at.
+QUEUED = "queued"
+RESOLVING = "resolving"
+DOWNLOADING = "downloading"
+POSTPROCESSING = "post-processing"
+DONE = "done"
+FAILED = "failed"
+
+FINISHED_STATES = (DONE, FAILED)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    url TEXT NOT NULL,
+    format TEXT NOT NULL,
+    folder TEXT,
+    title TEXT,
+    state TEXT NOT NULL,
+    error TEXT,
+    created_at REAL,
+    updated_at REAL,
+    priority TEXT,
+    error_class TEXT,
+    attempts INTEGER,
+    duration REAL,
+    tags TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs(state);
+"""
+
+class JobStore:
+    """Queue persisted to SQLite so pending work survives a restart.
+
+    Only state transitions are written (a handful per job), never progress.
+    """
+
+    def __init__(self, db_path=JOBS_DB):
+        self._lock = threading.Lock()
+        self._closed = False
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        # jobs.db files from before these columns existed
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(jobs)")]
+        for name, kind in (("priority", "TEXT"), ("error_class", "TEXT"), ("attempts", "INTEGER"),
+                           ("duration", "REAL"), ("tags", "TEXT")):
+            if name not in columns:
+                self.conn.execute(f"ALTER TABLE jobs ADD COLUMN {name} {kind}")
+        self.conn.commit()
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            if self._closed:
+                return
+            self.conn.execute(sql, params)
+            self.conn.commit()
+
+    def save(self, job):
+        now = time.time()
+        self._execute(
+            "INSERT OR REPLACE INTO jobs (id, kind, url, format, folder, title, state, error, created_at, updated_at, "
+            "priority, duration, tags) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (int(job.id), job.kind, job.url, job.fmt, job.folder, job.title, job.state, job.error,
+             job.created_at, now, job.priority, job.duration, json.dumps(job.tags) if job.tags else None))
+
+    def set_state(self, job):
+        self._execute("UPDATE jobs SET state = ?, title = ?, error = ?, error_class = ?, attempts = ?, updated_at = ? "
+                      "WHERE id = ?",
+                      (job.state, job.title, job.error, job.error_class, job.attempts, time.time(), int(job.id)))
+
+    def load_unfinished(self):
+        # Oldest first, so resumed jobs keep their original order
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT * FROM jobs WHERE state NOT IN (%s) ORDER BY id" % ",".join("?" * len(FINISHED_STATES)),
+                FINISHED_STATES).fetchall()
+        return [dict(row) for row in rows]
+
+    def load_failed(self, job_ids=None, limit=None):
+        # Failed jobs, newest first; job_ids narrows it down to those
+        sql = "SELECT * FROM jobs WHERE state = ?"
+        params = [FAILED]
+        if job_ids is not None:
+            job_ids = [int(job_id) for job_id in job_ids]
+            sql += " AND id IN (%s)" % ",".join("?" * len(job_ids))
+            params += job_ids
+        sql += " ORDER BY updated_at DESC, id DESC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            rows = self.conn.execute(sql, params).fetchall()
+        return [dict(row) for row in rows]
+
+    def count_failed(self):
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM jobs WHERE state = ?", (FAILED,)).fetchone()[0]
+
+    def max_id(self):
+        with self._lock:
+            return self.conn.execute("SELECT COALESCE(MAX(id), 0) FROM jobs").fetchone()[0]
+
+    def prune_done(self):
+        self._execute("DELETE FROM jobs WHERE state = ?", (DONE,))
+
+    def clear_failed(self):
+        self._execute("DELETE FROM jobs WHERE state = ?", (FAILED,))
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self.conn.close()
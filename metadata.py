@@ -0,0 +1,70 @@
+import time
+from urllib.parse import urlparse, parse_qs
+
+from cache import DiskCache
+
+STREAM_URL_TTL = 3600  # Assumed lifetime of stream URLs that carry no expiry
+STREAM_URL_MARGIN = 600  # Stop trusting stream URLs this long before they expire
+
+# Bulky parts of an info dict the downloader never reads
+HEAVY_KEYS = ("automatic_captions", "subtitles", "heatmap", "thumbnails", "description")
+
+def urls_expire(info, now=None):
+    # Earliest expiry of the signed stream URLs in info (YouTube's expire=,
+    # CDN-style Expires=), or now + STREAM_URL_TTL if none of them say
+    now = now or time.time()
+    expiries = []
+    for fmt in info.get("formats") or [info]:
+        query = parse_qs(urlparse(fmt.get("url") or "").query)
+        for name in ("expire", "Expires"):
+            try:
+                expiries.append(float(query[name][0]))
+            except (KeyError, ValueError):
+                pass
+    return min(expiries) if expiries else now + STREAM_URL_TTL
+
+def info_size(info):
+    # Bytes of the selected format(s), exact where known, else yt-dlp's estimate
+    formats = info.get("requested_formats") or [info]
+    sizes = [f.get("filesize") or f.get("filesize_approx") for f in formats]
+    return sum(sizes) if all(sizes) else None
+
+class MetadataStore:
+    """Info dicts cached on disk, keyed like the engine's job identities.
+
+    A record is {'info', 'size', 'urls_expire'}. The info dict can be handed
+    straight back to yt-dlp (process_ie_result) for the download, as long as
+    its stream URLs haven't expired. That is also when the row expires, so
+    purge_expired() clears out what downloads didn't use (forget()).
+    """
+
+    def __init__(self, cache=None):
+        self.cache = cache if cache is not None else DiskCache("info_cache")
+
+    def get(self, key):
+        record = self.cache.get(key)
+        if record is None or record["urls_expire"] - STREAM_URL_MARGIN < time.time():
+            return None
+        return record
+
+    def put(self, key, info):
+        # Returns the stored record, or None for results that aren't a single video
+        if not info or info.get("_type", "video") != "video" or "entries" in info:
+            return None
+        import yt_dlp
+        record = {"size": info_size(info), "urls_expire": urls_expire(info)}
+        info = yt_dlp.YoutubeDL.sanitize_info(dict(info), remove_private_keys=True)
+        for name in HEAVY_KEYS:
+            info.pop(name, None)
+        if info.get("formats"):
+            # Storyboards are image formats with a fragment list each, never downloaded
+            info["formats"] = [f for f in info["formats"] if f.get("ext") != "mhtml"]
+        record["info"] = info
+        self.cache.set(key, record, ttl=max(record["urls_expire"] - time.time(), 1))
+        return record
+
+    def forget(self, key):
+        self.cache.delete(key)
+
+    def close(self):
+        self.cache.close()
@@ -0,0 +1,224 @@
+"""Pipeline instrumentation.
+
+PipelineStats is fed by the engine: time spent per stage, bytes moved and
+how jobs ended. MetricsLog writes engine events plus a periodic sample of
+the gauges to a JSONL file, MetricsServer serves the same numbers in the
+Prometheus text format on http://127.0.0.1:<port>/metrics.
+"""
+import json
+import time
+import threading
+import contextlib
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Stages timed per job, in pipeline order
+STAGES = ("resolve", "metadata", "download", "postprocess", "tag", "history")
+SAMPLE_INTERVAL = 5.0  # Seconds between gauge samples in the JSONL log
+
+class PipelineStats:
+    """Counters for the whole run, safe to update from any worker thread."""
+
+    def __init__(self):
+        self.started = time.time()
+        self.results = {}  # "completed" / "skipped" / "failed" -> videos
+        self.errors = {}  # error class -> failures that ended a job
+        self.retries = {}  # error class -> retries scheduled
+        self.bytes = 0
+        self.stage_seconds = {}  # stage -> seconds summed over jobs
+        self.stage_runs = {}  # stage -> times the stage ran
+        self.stage_active = {}  # stage -> jobs in it right now
+        # Post-processing of finished audio jobs by what was done to the
+        # audio ("transcoded", "remuxed" or "kept"): action -> seconds / jobs
+        self.postprocess_seconds = {}
+        self.postprocess_jobs = {}
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def stage(self, job, name):
+        # Times the block into job.timings[name] and the run-wide totals
+        with self._lock:
+            self.stage_active[name] = self.stage_active.get(name, 0) + 1
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            seconds = time.monotonic() - start
+            job.timings[name] = job.timings.get(name, 0.0) + seconds
+            with self._lock:
+                self.stage_active[name] -= 1
+                self.stage_seconds[name] = self.stage_seconds.get(name, 0.0) + seconds
+                self.stage_runs[name] = self.stage_runs.get(name, 0) + 1
+
+    def add_bytes(self, count):
+        with self._lock:
+            self.bytes += count
+
+    def on_event(self, event, job, changes):
+        # Engine listener; playlists are aggregates and aren't counted
+        if event not in ("completed", "skipped", "failed", "retrying") or job.kind != "video":
+            return
+        with self._lock:
+            if event == "retrying":
+                self.retries[job.error_class] = self.retries.get(job.error_class, 0) + 1
+                return
+            self.results[event] = self.results.get(event, 0) + 1
+            action = job.postprocess_action
+            if event == "completed" and action:
+                self.postprocess_seconds[action] = (self.postprocess_seconds.get(action, 0.0)
+                                                    + job.timings.get("postprocess", 0.0))
+                self.postprocess_jobs[action] = self.postprocess_jobs.get(action, 0) + 1
+            if event == "failed":
+                self.errors[job.error_class] = self.errors.get(job.error_class, 0) + 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "uptime": time.time() - self.started,
+                "results": dict(self.results),
+                "errors": dict(self.errors),
+                "retries": dict(self.retries),
+                "bytes": self.bytes,
+                "stage_seconds": dict(self.stage_seconds),
+                "stage_runs": dict(self.stage_runs),
+                "stage_active": dict(self.stage_active),
+                "postprocess_seconds": dict(self.postprocess_seconds),
+                "postprocess_jobs": dict(self.postprocess_jobs),
+            }
+
+def job_record(event, job):
+    # One JSONL line for a job event
+    return {
+        "ts": time.time(),
+        "event": event,
+        "job": job.id,
+        "kind": job.kind,
+        "parent": job.parent.id if job.parent is not None else None,
+        "title": job.title,
+        "state": job.state,
+        "attempts": job.attempts,
+        "error_class": job.error_class,
+        "error": job.error,
+        "bytes": job.bytes_total,
+        "size": job.size,
+        "postprocess": job.postprocess_action,
+        "timings": {stage: round(seconds, 4) for stage, seconds in job.timings.items()},
+    }
+
+class MetricsLog:
+    """Appends job events and gauge samples from an engine to a JSONL file.
+
+    Progress ("updated") events are left out, everything else is one line
+    each; every `interval` seconds a "sample" line has engine.metrics().
+    """
+
+    def __init__(self, engine, path, interval=SAMPLE_INTERVAL):
+        self.engine = engine
+        self.interval = interval
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        engine.subscribe(self.on_event)
+        self._thread = threading.Thread(target=self._sample_loop, daemon=True)
+        self._thread.start()
+
+    def write(self, record):
+        line = json.dumps(record, default=str)
+        with self._lock:
+            if not self._file.closed:
+                self._file.write(line + "\n")
+                self._file.flush()
+
+    def on_event(self, event, job, changes):
+        if event != "updated":
+            self.write(job_record(event, job))
+
+    def _sample_loop(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def sample(self):
+        self.write(dict(ts=time.time(), event="sample", **self.engine.metrics()))
+
+    def close(self):
+        self._stop.set()
+        self.engine.unsubscribe(self.on_event)
+        self.sample()
+        with self._lock:
+            self._file.close()
+
+def render_prometheus(metrics):
+    # engine.metrics() -> Prometheus text exposition format
+    lines = []
+
+    def metric(name, kind, help_text, samples):
+        lines.append(f"# HELP musicdl_{name} {help_text}")
+        lines.append(f"# TYPE musicdl_{name} {kind}")
+        for labels, value in samples:
+            label_text = ",".join(f'{k}="{v}"' for k, v in labels.items())
+            lines.append(f"musicdl_{name}{{{label_text}}} {value}" if label_text else f"musicdl_{name} {value}")
+
+    metric("jobs_total", "counter", "Finished video jobs by result.",
+           [({"result": result}, metrics["results"].get(result, 0)) for result in ("completed", "skipped", "failed")])
+    metric("errors_total", "counter", "Jobs that failed, by error class.",
+           [({"class": cls}, count) for cls, count in sorted(metrics["errors"].items())])
+    metric("retries_total", "counter", "Retries scheduled, by error class.",
+           [({"class": cls}, count) for cls, count in sorted(metrics["retries"].items())])
+    metric("downloaded_bytes_total", "counter", "Bytes downloaded.", [({}, metrics["bytes"])])
+    metric("stage_seconds_total", "counter", "Time jobs spent in each pipeline stage.",
+           [({"stage": stage}, round(metrics["stage_seconds"].get(stage, 0.0), 4)) for stage in STAGES])
+    metric("stage_runs_total", "counter", "Times each pipeline stage ran.",
+           [({"stage": stage}, metrics["stage_runs"].get(stage, 0)) for stage in STAGES])
+    metric("stage_active", "gauge", "Jobs in each pipeline stage right now.",
+           [({"stage": stage}, metrics["stage_active"].get(stage, 0)) for stage in STAGES])
+    metric("postprocess_seconds_total", "counter", "Post-processing time of finished audio jobs, by action.",
+           [({"action": action}, round(seconds, 4))
+            for action, seconds in sorted(metrics["postprocess_seconds"].items())])
+    metric("postprocess_jobs_total", "counter", "Finished audio jobs by post-processing action.",
+           [({"action": action}, count) for action, count in sorted(metrics["postprocess_jobs"].items())])
+    metric("jobs_pending", "gauge", "Jobs queued or running, playlists included.", [({}, metrics["pending"])])
+    metric("download_backlog", "gauge", "Video jobs waiting for a download slot.", [({}, metrics["backlog"])])
+    metric("postprocess_backlog", "gauge", "Downloaded jobs waiting for an FFmpeg worker.",
+           [({}, metrics["postprocess_backlog"])])
+    metric("download_slots", "gauge", "Download slots by state.",
+           [({"state": "busy"}, metrics["downloads_active"]), ({"state": "limit"}, metrics["download_limit"])])
+    metric("postprocess_workers", "gauge", "FFmpeg workers.", [({}, metrics["postprocess_workers"])])
+    metric("utilisation", "gauge", "Busy share of each worker pool (0-1).",
+           [({"pool": pool}, round(value, 4)) for pool, value in sorted(metrics["utilisation"].items())])
+    metric("paused", "gauge", "1 while downloads are paused because the source is rate-limiting.",
+           [({}, int(metrics["paused"]))])
+    metric("uptime_seconds", "gauge", "Seconds since the engine started.", [({}, round(metrics["uptime"], 3))])
+    return "\n".join(lines) + "\n"
+
+class MetricsServer:
+    # GET /metrics on a local port, for Prometheus or a quick curl
+    def __init__(self, engine, port, host="127.0.0.1"):
+        server = self
+        self.engine = engine
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = render_prometheus(server.engine.metrics()).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/metrics"
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
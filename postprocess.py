@@ -0,0 +1,97 @@
+import os
+import sys
+import subprocess
+
+from install_ffmpeg import find_ffmpeg
+from scheduler import POSTPROCESS_WORKERS
+
+AUDIO_ENCODERS = {"mp3": "libmp3lame"}
+
+# Source codecs (yt-dlp 'acodec' families) that can be kept as-is, and the
+# container each one is remuxed into
+PASSTHROUGH_EXTS = {"mp3": "mp3", "aac": "m4a", "opus": "opus", "vorbis": "ogg"}
+
+def ffmpeg_threads(workers=POSTPROCESS_WORKERS):
+    # Split the cores between the conversions running side by side rather
+    # than letting every ffmpeg grab all of them
+    return max(1, (os.cpu_count() or 1) // max(1, workers))
+
+def run_ffmpeg(args):
+    cmd = [find_ffmpeg(), "-y", "-hide_banner", "-loglevel", "error"] + args
+    kwargs = {}
+    if sys.platform == "win32":
+        # Don't flash a console window per conversion
+        kwargs["creationflags"] = subprocess.CREATE_NO_WINDOW
+    result = subprocess.run(cmd, capture_output=True, text=True, errors="replace", **kwargs)
+    if result.returncode != 0:
+        raise Exception(f"FFmpeg failed: {result.stderr.strip()[-200:]}")
+
+def codec_family(acodec):
+    # yt-dlp reports e.g. "mp4a.40.2", "opus", "mp3", "none"
+    acodec = (acodec or "").lower()
+    if acodec.startswith("mp4a") or acodec == "aac":
+        return "aac"
+    return acodec.split(".")[0] or None
+
+def convert_audio(src, codec="mp3", quality="192", acodec=None, passthrough=False, workers=POSTPROCESS_WORKERS):
+    """Turn a downloaded audio stream into the final audio file.
+
+    Re-encodes only when it has to: a source already in `codec` is kept
+    (remuxed if it sits in another container), and with passthrough=True
+    AAC/Opus/Vorbis sources are remuxed into .m4a/.opus/.ogg instead of
+    being transcoded. Returns (path, action) with action one of "kept",
+    "remuxed" or "transcoded"; a replaced source file is removed.
+    """
+    base, ext = os.path.splitext(src)
+    family = codec_family(acodec)
+
+    if family == codec or (passthrough and family in PASSTHROUGH_EXTS):
+        target_ext = PASSTHROUGH_EXTS[family]
+        if ext.lower() == "." + target_ext:
+            return src, "kept"
+        dst = base + "." + target_ext
+        run_ffmpeg(["-i", src, "-vn", "-c:a", "copy", dst])
+        action = "remuxed"
+    else:
+        if ext.lower() == "." + codec:
+            return src, "kept"
+        dst = base + "." + codec
+        run_ffmpeg(["-i", src, "-vn", "-c:a", AUDIO_ENCODERS[codec], "-b:a", f"{quality}k",
+                    "-threads", str(ffmpeg_threads(workers)), dst])
+        action = "transcoded"
+
+    os.remove(src)
+    return dst, action
+
+# Tags written into finished files, and the containers that take a cover image
+TAG_KEYS = ("title", "artist", "album", "track", "date")
+COVER_EXTS = ("mp3", "m4a")
+
+def write_tags(path, tags, cover=None):
+    """Write tags (and, for MP3/M4A, a cover image) into a finished audio file.
+
+    The streams are copied, not re-encoded: ffmpeg writes a tagged copy next
+    to the file, which then replaces it. That's cheap for audio (a few MB),
+    so it isn't meant for videos. Existing tags not in `tags` stay.
+    """
+    base, ext = os.path.splitext(path)
+    ext = ext.lower().lstrip(".")
+    tmp = f"{base}.tagging.{ext}"
+    args = ["-i", path]
+    if cover and ext in COVER_EXTS:
+        # Replaces any cover the file already had
+        args += ["-i", cover, "-map", "0:a", "-map", "1:v", "-disposition:v", "attached_pic"]
+    else:
+        args += ["-map", "0"]
+    args += ["-c", "copy"]
+    if ext == "mp3":
+        args += ["-id3v2_version", "3"]
+    for key in TAG_KEYS:
+        if tags.get(key):
+            args += ["-metadata", f"{key}={tags[key]}"]
+    try:
+        run_ffmpeg(args + [tmp])
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
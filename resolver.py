@@ -0,0 +1,124 @@
+import threading
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+
+from cache import DiskCache
+
+RESOLVE_WORKERS = 4  # Concurrent YouTube searches, separate from download slots
+QUERY_CACHE_TTL = 30 * 24 * 3600  # Seconds a query -> video ID mapping is trusted
+SEARCH_CANDIDATES = 5  # Results compared against the expected duration
+DURATION_TOLERANCE = 0.1  # Share of the expected duration a match may be off by
+MIN_DURATION_SLACK = 10  # ... but at least this many seconds
+
+def normalize_query(query):
+    return " ".join(query.lower().split())
+
+def cache_key(query, duration=None):
+    # Matches picked for a known duration are kept apart from plain searches
+    key = normalize_query(query)
+    return f"{key}|{round(duration)}s" if duration else key
+
+def pick_candidate(entries, duration=None):
+    # Result whose length is closest to the expected duration (seconds), so a
+    # 3-minute track doesn't get the 1-hour "full album" upload or the
+    # 30-second preview. Only results within the tolerance count, the earlier
+    # one wins a tie; falls back to the first result.
+    if not entries:
+        return None
+    if duration:
+        slack = max(MIN_DURATION_SLACK, duration * DURATION_TOLERANCE)
+        close = [e for e in entries if e.get('duration') and abs(e['duration'] - duration) <= slack]
+        if close:
+            return min(close, key=lambda e: abs(e['duration'] - duration))
+    return entries[0]
+
+def youtube_search(query, duration=None):
+    # Default search backend: best YouTube result for query (see
+    # pick_candidate), without resolving formats. Returns {'id', 'title',
+    # 'url', 'duration'} or None.
+    ydl_opts = {
+        'quiet': True,
+        'no_warnings': True,
+        'skip_download': True,
+        'extract_flat': 'in_playlist',
+    }
+    import yt_dlp
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        # The flat search page lists several results for the cost of one
+        info = ydl.extract_info(f"ytsearch{SEARCH_CANDIDATES if duration else 1}:{query}", download=False)
+    entry = pick_candidate([e for e in (info or {}).get('entries') or [] if e], duration)
+    if not entry:
+        return None
+    return {
+        'id': entry.get('id'),
+        'title': entry.get('title'),
+        'url': entry.get('url') or f"https://www.youtube.com/watch?v={entry.get('id')}",
+        'duration': entry.get('duration'),
+    }
+
+def iter_youtube_playlist(url):
+    # Yields flat playlist entries ({'id', 'title', 'url'}) as yt-dlp pages
+    # through the playlist, without resolving any formats
+    ydl_opts = {
+        'quiet': True,
+        'no_warnings': True,
+        'skip_download': True,
+        'extract_flat': 'in_playlist',
+        'lazy_playlist': True,
+    }
+    import yt_dlp
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        # process=False keeps 'entries' as yt-dlp's lazy page generator
+        info = ydl.extract_info(url, download=False, process=False)
+        # watch?v=...&list=... comes back as a redirect to the playlist itself
+        for _ in range(3):
+            if not info or info.get('_type') not in ('url', 'url_transparent'):
+                break
+            info = ydl.extract_info(info['url'], download=False, process=False, ie_key=info.get('ie_key'))
+        for entry in (info or {}).get('entries') or []:
+            if entry:
+                yield entry
+
+class Resolver:
+    """Search stage that turns text queries into concrete YouTube videos.
+
+    Runs on its own pool so a slow search never holds a download slot, and
+    keeps a persistent query -> video cache so repeated playlists resolve
+    without touching the network. `search` is any callable
+    query -> {'id', 'title', 'url'} or None;
+    when a job knows the track's duration it is passed as duration=seconds.
+    """
+
+    def __init__(self, search=youtube_search, max_workers=RESOLVE_WORKERS, cache=None, ttl=QUERY_CACHE_TTL):
+        self.search = search
+        self.ttl = ttl
+        self.cache = cache if cache is not None else DiskCache("query_cache", ttl=ttl)
+        self.max_workers = max_workers
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="resolve")
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def submit(self, fn, *args):
+        return self.executor.submit(fn, *args)
+
+    def resolve(self, query, duration=None, gate=None):
+        # gate: context manager factory wrapped around the search itself,
+        # cache hits don't go through it
+        key = cache_key(query, duration)
+        result = self.cache.get(key)
+        if result is not None:
+            with self._lock:
+                self.hits += 1
+            return result
+        with self._lock:
+            self.misses += 1
+        with gate() if gate else contextlib.nullcontext():
+            result = self.search(query, duration=duration) if duration else self.search(query)
+        if result and result.get('id'):
+            self.cache.set(key, result, ttl=self.ttl)
+        return result
+
+    def shutdown(self, wait=False):
+        self.executor.shutdown(wait=wait, cancel_futures=True)
+        self.cache.close()
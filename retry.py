@@ -0,0 +1,166 @@
+import re
+import time
+import random
+import threading
+
+# What went wrong, as far as retrying is concerned
+NETWORK = "network"  # Timeouts, resets, 5xx: worth retrying
+THROTTLED = "throttled"  # 429 / bot checks: retry later and pause the pool
+EXPIRED = "expired"  # 403/410 on stream URLs: retry with fresh metadata
+UNAVAILABLE = "unavailable"  # Private, removed, blocked, no match: give up
+FFMPEG = "ffmpeg"  # Merge or conversion failed: give up
+UNKNOWN = "unknown"  # Anything else: a couple more tries
+
+LABELS = {
+    NETWORK: "Network error",
+    THROTTLED: "Rate limited",
+    EXPIRED: "Link expired",
+    UNAVAILABLE: "Unavailable",
+    FFMPEG: "FFmpeg error",
+    UNKNOWN: "Error",
+}
+
+# Tries per job, including the first, by error class
+MAX_ATTEMPTS = {NETWORK: 5, THROTTLED: 5, EXPIRED: 3, UNKNOWN: 3, UNAVAILABLE: 1, FFMPEG: 1}
+RETRY_DELAY = 2.0  # Seconds before the first retry, doubled for each further one
+MAX_RETRY_DELAY = 300.0
+
+# yt-dlp messages carry video IDs, and sometimes titles or file paths, so
+# status codes only count where the text says they are one ("HTTP Error 429")
+STATUS_RE = re.compile(r"(?:http error|status code|status|http)\s*:?\s*([1-5]\d\d)\b")
+THROTTLE_MARKERS = ("too many requests", "rate limit", "rate-limit", "throttled", "not a bot")
+FFMPEG_MARKERS = ("ffmpeg failed", "ffmpeg not found", "ffmpeg is not installed", "ffprobe not found",
+                  "postprocessing:", "conversion failed")
+UNAVAILABLE_MARKERS = ("video unavailable", "is unavailable", "not available", "private video", "has been removed",
+                       "copyright", "members-only", "confirm your age", "age-restricted", "no youtube match",
+                       "no tracks found", "unsupported url", "does not exist", "account associated",
+                       "has been terminated", "blocked it")
+NETWORK_MARKERS = ("timed out", "connection reset", "connection refused", "connection aborted", "reset by peer",
+                   "temporary failure", "name resolution", "name or service not known", "unreachable",
+                   "incomplete read", "remote end closed", "ssl:", "eof occurred")
+# Exception classes (by name, so yt-dlp isn't imported for this) along a cause chain
+NETWORK_ERRORS = ("TransportError", "ConnectionError", "TimeoutError", "IncompleteRead", "SSLError",
+                  "RemoteDisconnected")
+FFMPEG_ERRORS = ("PostProcessingError",)
+
+def error_chain(error):
+    # The exception and what it wraps: yt-dlp's DownloadError/ExtractorError
+    # keep the original in exc_info / cause, plain ones in __cause__
+    seen = []
+    while isinstance(error, BaseException) and not any(error is e for e in seen):
+        seen.append(error)
+        exc_info = getattr(error, "exc_info", None)
+        error = ((exc_info[1] if exc_info else None) or getattr(error, "cause", None)
+                 or error.__cause__ or error.__context__)
+    return seen
+
+def error_status(error):
+    # HTTP status behind an error: from the exception (yt-dlp's HTTPError
+    # .status, urllib's .code, requests' .response) or else the message
+    for e in error_chain(error):
+        for status in (getattr(e, "status", None), getattr(e, "code", None),
+                       getattr(getattr(e, "response", None), "status_code", None)):
+            if isinstance(status, int) and 100 <= status < 600:
+                return status
+    match = STATUS_RE.search(str(error).lower())
+    return int(match.group(1)) if match else None
+
+def classify_error(error):
+    # error is the exception that ended the attempt, or just its message
+    message = str(error or "").lower()
+    names = {cls.__name__ for e in error_chain(error) for cls in type(e).__mro__}
+    if names & set(FFMPEG_ERRORS) or any(marker in message for marker in FFMPEG_MARKERS):
+        return FFMPEG
+    status = error_status(error)
+    if status == 429 or any(marker in message for marker in THROTTLE_MARKERS):
+        return THROTTLED
+    if status in (403, 410):
+        return EXPIRED  # Signed stream URLs went stale
+    if status == 408 or (status or 0) >= 500:
+        return NETWORK
+    if status == 404 or any(marker in message for marker in UNAVAILABLE_MARKERS):
+        return UNAVAILABLE
+    if names & set(NETWORK_ERRORS) or any(marker in message for marker in NETWORK_MARKERS):
+        return NETWORK
+    return UNKNOWN
+
+def should_retry(error_class, attempts):
+    # attempts = tries made so far
+    return attempts < MAX_ATTEMPTS.get(error_class, 1)
+
+def retry_delay(error_class, attempts):
+    # Exponential backoff with jitter, so jobs that failed together don't
+    # all come back at the same moment. Throttling backs off harder.
+    base = RETRY_DELAY * (4 if error_class == THROTTLED else 1)
+    delay = min(MAX_RETRY_DELAY, base * 2 ** (attempts - 1))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+class CircuitBreaker:
+    """Pauses all downloads while the source is rate-limiting us.
+
+    `threshold` throttled failures within `window` seconds open the circuit:
+    wait() then blocks every download for `cooldown` seconds. After that a
+    single probe download goes through (half-open); if it is throttled
+    again the pause doubles (up to max_cooldown), otherwise downloads resume.
+    Callers report each attempt with done(error_class or None), from the
+    thread that called wait().
+    """
+
+    def __init__(self, threshold=3, window=60.0, cooldown=30.0, max_cooldown=600.0):
+        self.threshold = threshold
+        self.window = window
+        self.base_cooldown = cooldown
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.paused_until = 0.0
+        self.trips = 0
+        self._throttles = []
+        self._probe = None  # Thread making the half-open test download
+        self._cond = threading.Condition()
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(threshold=config.get("throttle_threshold", 3),
+                   cooldown=config.get("throttle_pause", 30.0))
+
+    @property
+    def paused(self):
+        return time.monotonic() < self.paused_until
+
+    def wait(self):
+        with self._cond:
+            while True:
+                remaining = self.paused_until - time.monotonic()
+                if remaining > 0:
+                    self._cond.wait(remaining)
+                elif self._probe is not None:
+                    self._cond.wait()  # Someone else is testing the water
+                else:
+                    break
+            if self.paused_until:
+                # First one through after a pause is the probe
+                self._probe = threading.get_ident()
+
+    def done(self, error_class=None):
+        # Returns True if this result (re)opened the circuit
+        with self._cond:
+            now = time.monotonic()
+            probe = self._probe == threading.get_ident()
+            if probe:
+                self._probe = None
+            if error_class == THROTTLED and (probe or now >= self.paused_until):
+                self._throttles = [t for t in self._throttles if now - t < self.window] + [now]
+                if probe or len(self._throttles) >= self.threshold:
+                    if probe:
+                        self.cooldown = min(self.max_cooldown, self.cooldown * 2)
+                    self.paused_until = now + self.cooldown
+                    self._throttles = []
+                    self.trips += 1
+                    self._cond.notify_all()
+                    return True
+            elif probe:
+                # The source is answering again
+                self.paused_until = 0.0
+                self.cooldown = self.base_cooldown
+            self._cond.notify_all()
+            return False
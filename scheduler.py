@@ -0,0 +1,205 @@
+import os
+import time
+import heapq
+import itertools
+import threading
+
+# Download concurrency, overridable in config.json
+INITIAL_DOWNLOADS = 3
+MIN_DOWNLOADS = 1
+MAX_DOWNLOADS = 8
+ADJUST_INTERVAL = 5.0  # Seconds of measurements behind each adjustment
+
+# FFmpeg work is CPU-bound, so its pool follows the core count instead
+POSTPROCESS_WORKERS = os.cpu_count() or 2
+
+THROTTLE_COOLDOWN = 10  # Adjustment windows before retrying a level that got throttled
+
+# Bandwidth shares: a group (playlist or folder) gets bytes in proportion
+# to the weight of the priority it downloads at
+PRIORITIES = {"low": 1, "normal": 2, "high": 4}
+DEFAULT_PRIORITY = "normal"
+
+def parse_rate(text):
+    # "2M", "500K", "1.5MiB/s" or plain bytes -> bytes/s; "0" or "" -> None (no cap)
+    text = str(text or "").strip().upper().replace("/S", "")
+    for suffix in ("B", "I"):
+        if text.endswith(suffix):
+            text = text[:-1]
+    if not text:
+        return None
+    scale = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}.get(text[-1], 1)
+    value = float(text[:-1] if scale > 1 else text) * scale
+    return int(value) or None
+
+class AdaptiveLimiter:
+    """Concurrency limit for downloads that follows measured throughput.
+
+    Hill climbing over aggregate bytes/s: while the limit is actually in
+    use, step up as long as throughput doesn't get worse and step back when
+    a step up clearly hurt. Throttling (HTTP 429) steps down and marks that
+    level as a ceiling for a while (THROTTLE_COOLDOWN windows); a window
+    where most jobs fail halves the limit. With adaptive=False the limit
+    stays where it was set.
+    """
+
+    def __init__(self, initial=INITIAL_DOWNLOADS, minimum=MIN_DOWNLOADS, maximum=MAX_DOWNLOADS,
+                 adaptive=True, interval=ADJUST_INTERVAL):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = min(max(initial, self.minimum), self.maximum)
+        self.adaptive = adaptive
+        self.interval = interval
+        self.active = 0
+        self._cond = threading.Condition()
+        self.history = []  # (timestamp, limit, bytes/s) per adjustment window
+        self._reset_window(time.monotonic())
+        self._last_rate = None
+        self._last_step = 0
+        self._ceiling = None
+        self._ceiling_until = 0.0
+
+    @classmethod
+    def from_config(cls, config, workers=None):
+        # An explicit worker count (e.g. --workers) pins the limit
+        if workers:
+            return cls(initial=workers, minimum=workers, maximum=workers, adaptive=False)
+        return cls(initial=config.get("initial_downloads", INITIAL_DOWNLOADS),
+                   minimum=config.get("min_downloads", MIN_DOWNLOADS),
+                   maximum=config.get("max_downloads", MAX_DOWNLOADS),
+                   adaptive=config.get("adaptive_downloads", True),
+                   interval=config.get("adjust_interval", ADJUST_INTERVAL))
+
+    def _reset_window(self, now):
+        self._window_start = now
+        self._bytes = 0
+        self._completed = 0
+        self._errors = 0
+        self._throttles = 0
+        self._saturated = False
+
+    def acquire(self):
+        with self._cond:
+            if self.active >= self.limit:
+                self._saturated = True
+            self._cond.wait_for(lambda: self.active < self.limit)
+            self.active += 1
+
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify_all()
+        self.adjust()
+
+    def record_bytes(self, count):
+        with self._cond:
+            self._bytes += count
+        self.adjust()
+
+    def record_success(self):
+        with self._cond:
+            self._completed += 1
+
+    def record_error(self, throttled=False):
+        # throttled: the source is rate-limiting (see retry.classify_error)
+        with self._cond:
+            self._errors += 1
+            if throttled:
+                self._throttles += 1
+
+    def adjust(self, now=None):
+        now = time.monotonic() if now is None else now
+        with self._cond:
+            elapsed = now - self._window_start
+            if elapsed < self.interval:
+                return
+            rate = self._bytes / elapsed
+            if self._ceiling is not None and now >= self._ceiling_until:
+                self._ceiling = None
+            step = 0
+            if self.adaptive:
+                if self._errors > max(1, self._completed):
+                    step = -(self.limit - max(self.minimum, self.limit // 2))
+                elif self._throttles:
+                    self._ceiling = self.limit
+                    self._ceiling_until = now + self.interval * THROTTLE_COOLDOWN
+                    step = -1
+                elif not self._saturated:
+                    step = 0  # Not enough work to need more slots, nothing to learn
+                elif self._last_step > 0 and rate < self._last_rate * 0.8:
+                    step = -1  # The last step up didn't pay off
+                elif self._last_rate is None or rate >= self._last_rate * 0.9:
+                    if self._ceiling is None or self.limit + 1 < self._ceiling:
+                        step = 1
+
+            new_limit = min(max(self.limit + step, self.minimum), self.maximum)
+            step = new_limit - self.limit
+            self.limit = new_limit
+            self._last_step = step
+            self._last_rate = rate
+            self.history.append((time.time(), self.limit, rate))
+            del self.history[:-1000]
+            self._reset_window(now)
+            self._cond.notify_all()
+
+class BandwidthGovernor:
+    """Process-wide token bucket that every download draws from.
+
+    Downloads call consume() with the bytes they just read and are held
+    back until the bucket allows them, so all of them together stay under
+    `rate` bytes/s. Waiting downloads are served in weighted fair order per
+    group (self-clocked fair queueing): each group, e.g. a playlist or a
+    folder, gets a share of the link in proportion to its priority weight,
+    however many connections it has open. A huge video fetched over eight
+    segments then can't starve a playlist of small audio tracks. Idle
+    groups don't bank credit. With rate=None nothing is ever held back.
+    """
+
+    def __init__(self, rate=None, burst=None, fair=True):
+        self.rate = rate
+        self.burst = burst or (rate // 4 if rate else None)  # Bytes let out at once after a quiet spell
+        self.fair = fair
+        self._cond = threading.Condition()
+        self._tokens = self.burst or 0
+        self._updated = time.monotonic()
+        self._virtual = 0.0  # Tag of the request served last
+        self._finish = {}  # group -> tag of its latest request
+        self._waiting = []  # heap of (tag, seq)
+        self._seq = itertools.count()
+
+    @classmethod
+    def from_config(cls, config, rate=None):
+        # An explicit rate (e.g. --max-bandwidth) wins over config.json
+        rate = rate or parse_rate(config.get("max_bandwidth"))
+        return cls(rate=rate, fair=config.get("fair_bandwidth", True))
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def consume(self, group, nbytes, priority=DEFAULT_PRIORITY):
+        if nbytes <= 0:
+            return
+        group = group if self.fair else None
+        with self._cond:
+            if not self.rate:
+                return
+            weight = PRIORITIES.get(priority, PRIORITIES[DEFAULT_PRIORITY])
+            tag = max(self._virtual, self._finish.get(group, 0.0)) + nbytes / weight
+            self._finish[group] = tag
+            entry = (tag, next(self._seq))
+            heapq.heappush(self._waiting, entry)
+            # Served once first in line and the bucket is out of debt; the
+            # request may then overdraw it, which the next ones wait off
+            while True:
+                self._refill(time.monotonic())
+                if self._waiting[0] == entry and self._tokens >= 0:
+                    break
+                timeout = -self._tokens / self.rate if self._waiting[0] == entry else None
+                self._cond.wait(timeout)
+            heapq.heappop(self._waiting)
+            self._tokens -= nbytes
+            self._virtual = tag
+            if len(self._finish) > 1000:
+                self._finish = {g: t for g, t in self._finish.items() if t > self._virtual}
+            self._cond.notify_all()
@@ -0,0 +1,209 @@
+"""Multi-connection (segmented) downloads for yt-dlp.
+
+SegmentedYoutubeDL is a drop-in yt_dlp.YoutubeDL. With the
+'download_segments' option above 1, plain HTTP(S) formats are fetched as
+that many byte ranges in parallel. Each range is written straight to its
+offset in a preallocated file, so nothing is copied afterwards. When
+yt-dlp is about to fetch video and audio one after the other for a merge,
+both are fetched at once instead. Anything else (HLS/DASH fragments,
+servers without range support, small files, a .part from an earlier
+normal download) goes through yt-dlp's own downloader.
+"""
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import yt_dlp
+from yt_dlp.networking import Request
+from yt_dlp.utils import format_bytes
+
+MIN_SEGMENT_SIZE = 1024 * 1024  # Smaller files use fewer segments (or none)
+SEGMENT_RETRIES = 3  # Failed requests per segment before giving up
+READ_SIZE = 64 * 1024
+REPORT_INTERVAL = 0.1  # Seconds between progress hook calls
+
+class TransferProgress:
+    # Bytes across every file fetched together (e.g. video + audio), reported
+    # to the progress hooks as one stream, like yt-dlp's downloader would.
+    # throttle(nbytes), if given, runs on the connection that read them and
+    # may block it to hold the rate down.
+    def __init__(self, hooks, filename, total, throttle=None):
+        self.hooks = hooks
+        self.throttle = throttle
+        self.filename = filename
+        self.total = total
+        self.done = 0
+        self.started = time.monotonic()
+        self._last_report = 0.0
+        self._lock = threading.Lock()
+
+    def advance(self, n):
+        if self.throttle:
+            self.throttle(n)
+        with self._lock:
+            self.done += n
+            now = time.monotonic()
+            if now - self._last_report < REPORT_INTERVAL:
+                return
+            self._last_report = now
+        self.report("downloading")
+
+    def report(self, status):
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        speed = self.done / elapsed
+        d = {
+            'status': status,
+            'filename': self.filename,
+            'downloaded_bytes': self.done,
+            'total_bytes': self.total,
+            'elapsed': elapsed,
+            'speed': speed,
+            'eta': (self.total - self.done) / speed if speed else None,
+            '_percent_str': f"{self.done * 100.0 / max(self.total, 1):5.1f}%",
+            '_speed_str': f"{format_bytes(speed)}/s",
+            'segmented': True,  # bytes were already passed to throttle()
+        }
+        for hook in self.hooks:
+            hook(d)
+
+class SegmentedYoutubeDL(yt_dlp.YoutubeDL):
+    throttle = None  # Optional callable(nbytes), see TransferProgress
+
+    def process_info(self, info_dict):
+        # Remember the formats of a merge, dl() is handed them one at a time
+        self._merge_formats = list(info_dict.get('requested_formats') or [])
+        self._fetched = {}  # filename -> dl() result, for formats fetched early
+        try:
+            return super().process_info(info_dict)
+        finally:
+            self._merge_formats, self._fetched = [], {}
+
+    def dl(self, name, info, subtitle=False, test=False):
+        fetched = getattr(self, '_fetched', {})
+        if name in fetched:
+            return fetched.pop(name)
+        segments = self.params.get('download_segments') or 1
+        if segments < 2 or subtitle or test or not self._can_segment(name, info):
+            return super().dl(name, info, subtitle, test)
+
+        files = [(name, info)] + self._merge_siblings(name, info)
+        sizes = [self._probe_size(f) for _, f in files]
+        if not sizes[0]:
+            return super().dl(name, info, subtitle, test)
+        # A sibling the server won't split is left for its own dl() call
+        files = [(n, f, size) for (n, f), size in zip(files, sizes) if size]
+
+        progress = TransferProgress(self._progress_hooks, name, sum(size for _, _, size in files), self.throttle)
+        self.write_debug(f"Segmented download of {len(files)} file(s), {segments} connections each")
+        # One thread per range plus one per file waiting on its ranges
+        with ThreadPoolExecutor(max_workers=(segments + 1) * len(files), thread_name_prefix="segment") as pool:
+            transfers = [pool.submit(self._fetch_file, pool, n, f, size, segments, progress)
+                         for n, f, size in files]
+            errors = [t.exception() for t in transfers if t.exception()]
+        if errors:
+            raise errors[0]
+        progress.report("finished")
+        for n, _, _ in files[1:]:
+            fetched[n] = (True, True)
+        return True, True
+
+    def _can_segment(self, name, info):
+        return (info.get('protocol') in ('http', 'https') and info.get('url') and not info.get('fragments')
+                and not info.get('is_live') and not os.path.exists(name + '.part'))
+
+    def _merge_siblings(self, name, info):
+        # The other formats of a video+audio merge and the file names yt-dlp
+        # will ask for them under: "<stem>.f<format_id>.<ext>"
+        merge_formats = getattr(self, '_merge_formats', [])
+        if len(merge_formats) < 2 or info.get('format_id') != merge_formats[0].get('format_id'):
+            return []
+        first = merge_formats[0]
+        suffix = f".f{first['format_id']}.{info['ext']}"
+        if not name.endswith(suffix):
+            return []
+        siblings = []
+        for f in merge_formats[1:]:
+            sibling = {k: v for k, v in info.items() if k not in first}
+            sibling.update(f)
+            sibling_name = name[:-len(suffix)] + f".f{f['format_id']}.{f['ext']}"
+            if self._can_segment(sibling_name, sibling) and not os.path.exists(sibling_name):
+                siblings.append((sibling_name, sibling))
+        return siblings
+
+    def _headers(self, info):
+        return dict(info.get('http_headers') or self._calc_headers(info))
+
+    def _probe_size(self, info):
+        # Total size via a one-byte range request; None if ranges aren't supported
+        try:
+            request = Request(info['url'], headers={**self._headers(info), 'Range': 'bytes=0-0'})
+            with self.urlopen(request) as response:
+                content_range = response.headers.get('Content-Range') or ''
+                if response.status != 206 or '/' not in content_range:
+                    return None
+                total = content_range.rsplit('/', 1)[1]
+                return int(total) if total.isdigit() and int(total) >= 2 * MIN_SEGMENT_SIZE else None
+        except Exception:
+            return None
+
+    def _fetch_file(self, pool, name, info, size, segments, progress):
+        # Splits the file into ranges fetched in parallel into name + ".seg",
+        # which only becomes `name` once every byte is accounted for
+        tmp = name + '.seg'
+        segments = max(1, min(segments, size // MIN_SEGMENT_SIZE))
+        step = -(-size // segments)
+        ranges = [(start, min(start + step, size) - 1) for start in range(0, size, step)]
+        with open(tmp, 'wb') as f:
+            f.truncate(size)
+        try:
+            parts = [pool.submit(self._fetch_range, info, tmp, start, end, progress) for start, end in ranges]
+            errors = [part.exception() for part in parts if part.exception()]
+            if errors:
+                raise errors[0]
+            written = sum(part.result() for part in parts)
+            expected = info.get('filesize')
+            if written != size or os.path.getsize(tmp) != size or (expected and expected != size):
+                raise Exception(f"Segmented download incomplete: got {written} of {expected or size} bytes")
+            os.replace(tmp, name)
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+
+    def _fetch_range(self, info, tmp, start, end, progress):
+        # Writes bytes start..end (inclusive) at their offset in tmp. Short
+        # reads are picked up from where they stopped; sites that want small
+        # requests (yt-dlp's http_chunk_size) get the range in chunks.
+        chunk_size = (info.get('downloader_options') or {}).get('http_chunk_size')
+        headers = self._headers(info)
+        pos, failures, written = start, 0, 0
+        with open(tmp, 'r+b') as f:
+            while pos <= end:
+                request_end = min(end, pos + chunk_size - 1) if chunk_size else end
+                before = pos
+                try:
+                    request = Request(info['url'], headers={**headers, 'Range': f'bytes={pos}-{request_end}'})
+                    with self.urlopen(request) as response:
+                        content_range = response.headers.get('Content-Range') or ''
+                        if response.status != 206 or not content_range.startswith(f'bytes {pos}-'):
+                            raise Exception(f"Server ignored the range request ({response.status})")
+                        f.seek(pos)
+                        while pos <= request_end:
+                            data = response.read(min(READ_SIZE, request_end - pos + 1))
+                            if not data:
+                                break
+                            f.write(data)
+                            pos += len(data)
+                            written += len(data)
+                            progress.advance(len(data))
+                    if pos == before:
+                        raise Exception("Server sent an empty range")
+                except Exception:
+                    failures += 1
+                    if failures > SEGMENT_RETRIES:
+                        raise
+                    time.sleep(failures)
+        return written
@@ -0,0 +1,96 @@
+import json
+import threading
+import contextlib
+from collections import OrderedDict
+
+MAX_IDLE_SESSIONS = 16  # YoutubeDL instances kept around between jobs
+DOWNLOAD_SEGMENTS = 4  # Connections per file when segmented downloads are on
+
+class Session:
+    # One YoutubeDL instance plus the job its hooks currently report to
+    def __init__(self, ydl):
+        self.ydl = ydl
+        self.on_progress = None
+        self.on_bytes = None
+        self.jobs = 0
+
+    def hook(self, d):
+        if self.on_progress:
+            self.on_progress(d)
+
+    def throttle(self, nbytes):
+        # Called by each segment connection after every read (see segmented.py)
+        if self.on_bytes:
+            self.on_bytes(nbytes)
+
+class SessionPool:
+    """Long-lived yt_dlp.YoutubeDL instances, reused across jobs.
+
+    A fresh YoutubeDL per video re-initialises extractors, cookies and HTTP
+    connections and fetches the YouTube player JS again. Here instances are
+    pooled per options profile (format, output dir, ...) and each is used by
+    one worker at a time; the progress hook is rebound per job instead of
+    rebuilding the instance. An instance that raised is closed rather than
+    reused, in case it was left in a bad state. max_idle=0 disables reuse.
+    """
+
+    def __init__(self, max_idle=MAX_IDLE_SESSIONS):
+        self.max_idle = max_idle
+        self._idle = OrderedDict()  # profile -> [Session], least recently used first
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+
+    @contextlib.contextmanager
+    def checkout(self, opts):
+        # opts must be JSON-serialisable (no hooks), it doubles as the pool key
+        profile = json.dumps(opts, sort_keys=True)
+        session = None
+        with self._lock:
+            idle = self._idle.get(profile)
+            if idle:
+                session = idle.pop()
+                self.reused += 1
+        if session is None:
+            from segmented import SegmentedYoutubeDL
+            session = Session(None)
+            session.ydl = SegmentedYoutubeDL(dict(opts, progress_hooks=[session.hook]))
+            session.ydl.throttle = session.throttle
+            with self._lock:
+                self.created += 1
+
+        try:
+            yield session
+        except BaseException:
+            session.on_progress = session.on_bytes = None
+            self._close(session)
+            raise
+        session.on_progress = session.on_bytes = None
+        session.jobs += 1
+        self._release(profile, session)
+
+    def _release(self, profile, session):
+        evicted = []
+        with self._lock:
+            self._idle.setdefault(profile, []).append(session)
+            self._idle.move_to_end(profile)
+            while self._idle and sum(len(s) for s in self._idle.values()) > self.max_idle:
+                oldest = next(iter(self._idle))
+                evicted.append(self._idle[oldest].pop(0))
+                if not self._idle[oldest]:
+                    del self._idle[oldest]
+        for old in evicted:
+            self._close(old)
+
+    def _close(self, session):
+        try:
+            session.ydl.close()
+        except Exception:
+            pass
+
+    def close(self):
+        with self._lock:
+            sessions = [s for idle in self._idle.values() for s in idle]
+            self._idle.clear()
+        for session in sessions:
+            self._close(session)
@@ -0,0 +1,216 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from cache import DiskCache
+
+CATALOGUE_TTL = 90 * 24 * 3600  # Seconds a track's metadata is kept
+CATALOGUE_WORKERS = 4  # Concurrent song_info lookups for a batch of single tracks
+ALBUM_PAGE_SIZE = 343  # Tracks per album request, SpotAPI's own upper limit
+
+class PublicApi:
+    """The spotapi.Public calls used here, plus album pages with the album.
+
+    Public.album_info only passes on the track items, which have no album
+    name or cover (those sit on the albumUnion); album_pages() yields the
+    whole albumUnion of each page instead.
+    """
+
+    @staticmethod
+    def playlist_info(playlist_id):
+        from spotapi import Public
+        return Public.playlist_info(playlist_id)
+
+    @staticmethod
+    def song_info(track_id):
+        from spotapi import Public
+        return Public.song_info(track_id)
+
+    @staticmethod
+    def album_pages(album_id):
+        from spotapi import PublicAlbum
+        from spotapi.public import client_pool
+        client = client_pool.get()
+        try:
+            album = PublicAlbum(album_id, client=client)
+            offset = 0
+            while True:
+                union = album.get_album_info(limit=ALBUM_PAGE_SIZE, offset=offset)["data"]["albumUnion"]
+                yield union
+                offset += ALBUM_PAGE_SIZE
+                if offset >= union["tracksV2"]["totalCount"]:
+                    break
+        finally:
+            client_pool.put(client)
+
+def parse_spotify_url(url):
+    # Returns (obj_type, obj_id), e.g. ("playlist", "37i9dQZF1DXcBWIGoYBM5M")
+    for obj_type in ("playlist", "album", "track"):
+        if f"{obj_type}/" in url:
+            return obj_type, url.split(f"{obj_type}/")[1].split("?")[0]
+    return "", ""
+
+def parse_track(data):
+    # Track record {'id', 'title', 'artists', 'duration', 'isrc', 'album',
+    # 'track_number', 'cover'} from
+    # any of SpotAPI's track shapes: a playlist item's itemV2.data, an album
+    # item's track, or getTrack's trackUnion. None if it isn't a track.
+    if not data or not data.get('name'):
+        return None
+    uri = data.get('uri') or ""
+    track_id = data.get('id') or (uri.rsplit(":", 1)[1] if uri.startswith("spotify:track:") else None)
+
+    # Playlists and albums list 'artists', getTrack splits first/other artists.
+    # Sometimes the name is under 'profile', sometimes direct.
+    artists = []
+    for key in ('artists', 'firstArtist', 'otherArtists'):
+        for artist in (data.get(key) or {}).get('items') or []:
+            name = (artist.get('profile') or {}).get('name') or artist.get('name')
+            if name and name not in artists:
+                artists.append(name)
+
+    millis = (data.get('trackDuration') or data.get('duration') or {}).get('totalMilliseconds')
+    album = data.get('albumOfTrack') or {}
+    # Cover art comes in a few sizes, the biggest is resized later anyway
+    covers = sorted((album.get('coverArt') or {}).get('sources') or [], key=lambda c: c.get('width') or 0)
+    return {
+        'id': track_id,
+        'title': data['name'],
+        'artists': artists,
+        'duration': millis / 1000.0 if millis else None,
+        'isrc': (data.get('externalIds') or {}).get('isrc') or data.get('isrc'),
+        'album': album.get('name'),
+        'track_number': data.get('trackNumber'),
+        'cover': covers[-1].get('url') if covers else None,
+    }
+
+def track_query(record):
+    # "artist - title", the YouTube search text (and history key) for a track
+    artist = record['artists'][0] if record.get('artists') else "Unknown"
+    return f"{artist} - {record['title']}"
+
+def parse_playlist_items(items_list):
+    # Structure: items -> [ { itemV2: { data: { name, artists: { items: [ { profile: { name } } ] } } } } ]
+    tracks = []
+    for item in items_list or []:
+        try:
+            record = parse_track(item.get('itemV2', {}).get('data'))
+            if record:
+                tracks.append(record)
+        except Exception:
+            continue
+    return tracks
+
+def parse_album_page(album):
+    # Structure: albumUnion { name, coverArt, tracksV2: { items: [ { track: { uri, name, duration, artists } } ] } }
+    # The tracks don't repeat the album, so it is filled in from the page
+    header = {'name': album.get('name'), 'coverArt': album.get('coverArt')}
+    tracks = []
+    for item in (album.get('tracksV2') or {}).get('items') or []:
+        try:
+            data = dict(item.get('track') or {})
+            data.setdefault('albumOfTrack', header)
+            record = parse_track(data)
+            if record:
+                tracks.append(record)
+        except Exception:
+            continue
+    return tracks
+
+def is_complete(record):
+    # Has everything tagging uses, so it's worth caching
+    return bool(record.get('album') and record.get('cover'))
+
+class SpotifyCatalogue:
+    """Spotify track metadata by track ID, cached on disk.
+
+    Every track seen on a playlist or album page is remembered, so looking
+    it up again later (e.g. pasting it as a single link) costs no request.
+    Tracks that aren't cached are fetched with SpotAPI's song_info, several
+    at once. Only complete records (with album and cover, see is_complete)
+    are cached. `public` is the SpotAPI wrapper, PublicApi by default.
+    """
+
+    def __init__(self, public=None, cache=None, ttl=CATALOGUE_TTL, workers=CATALOGUE_WORKERS):
+        self._public = public
+        self.ttl = ttl
+        self.workers = workers
+        self.cache = cache if cache is not None else DiskCache("spotify_catalogue", ttl=ttl)
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def public(self):
+        if self._public is None:
+            self._public = PublicApi
+        return self._public
+
+    def remember(self, records):
+        records = {record['id']: record for record in records if record.get('id') and is_complete(record)}
+        if records:
+            self.cache.set_many(records, ttl=self.ttl)
+
+    def tracks(self, track_ids):
+        # Records for track_ids, in order; None for tracks that couldn't be fetched
+        # Records cached before they carried album/cover are looked up again
+        found = {track_id: record for track_id, record in self.cache.get_many(track_ids).items()
+                 if is_complete(record)}
+        missing = [track_id for track_id in dict.fromkeys(track_ids) if track_id not in found]
+        self.hits += len(track_ids) - len(missing)
+        self.misses += len(missing)
+        if missing:
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(missing))) as pool:
+                fetched = [record for record in pool.map(self._fetch, missing) if record]
+            self.remember(fetched)
+            found.update((record['id'], record) for record in fetched)
+        return [found.get(track_id) for track_id in track_ids]
+
+    def _fetch(self, track_id):
+        try:
+            info = self.public.song_info(track_id) or {}
+            record = parse_track((info.get('data') or {}).get('trackUnion'))
+        except Exception as e:
+            print(f"Spotify Error: track {track_id}: {e}")
+            return None
+        if record and not record['id']:
+            record['id'] = track_id
+        return record
+
+    def close(self):
+        self.cache.close()
+
+def iter_spotify_tracks(url, public=None, catalogue=None):
+    # Yields one list of track records (see parse_track) per page, as soon
+    # as the page arrives, so callers can start queueing before pagination
+    # ends. url may hold several whitespace-separated Spotify links; single
+    # tracks among them are looked up together, as one batch.
+    own_catalogue = catalogue is None
+    if own_catalogue:
+        catalogue = SpotifyCatalogue(public=public)
+    try:
+        track_ids = []
+        for link in url.split():
+            obj_type, obj_id = parse_spotify_url(link)
+
+            if obj_type == "playlist":
+                for chunk in catalogue.public.playlist_info(obj_id):
+                    # Data is typically in 'items' for spotapi
+                    tracks = parse_playlist_items(chunk.get('items'))
+                    catalogue.remember(tracks)
+                    yield tracks
+
+            elif obj_type == "album":
+                for album in catalogue.public.album_pages(obj_id):
+                    tracks = parse_album_page(album)
+                    catalogue.remember(tracks)
+                    yield tracks
+
+            elif obj_type == "track":
+                track_ids.append(obj_id)
+
+            else:
+                print(f"Spotify Error: unsupported link {link}")
+
+        if track_ids:
+            yield [record for record in catalogue.tracks(track_ids) if record]
+    finally:
+        if own_catalogue:
+            catalogue.close()
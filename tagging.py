@@ -0,0 +1,120 @@
+import os
+import hashlib
+import threading
+
+from cache import DiskCache
+from postprocess import run_ffmpeg
+
+ARTWORK_DIR = "artwork"  # Resized cover images, named by the hash of their content
+ARTWORK_SIZE = 600  # Longest side of an embedded cover, in pixels
+ARTWORK_TTL = 30 * 24 * 3600  # Seconds an image URL -> file mapping is trusted
+
+def spotify_tags(record):
+    # Tags from a Spotify track record (see spotify.parse_track)
+    return {
+        'title': record.get('title'),
+        'artist': ", ".join(record.get('artists') or []) or None,
+        'album': record.get('album'),
+        'track': record.get('track_number'),
+        'cover': record.get('cover'),
+    }
+
+def info_tags(info):
+    # Tags from a yt-dlp info dict. YouTube Music uploads carry track/artist/
+    # album fields, for anything else it's the video title and the channel.
+    artist = info.get('artists') or info.get('artist') or info.get('creator') or info.get('uploader')
+    if isinstance(artist, list):
+        artist = ", ".join(artist)
+    if artist and artist.endswith(" - Topic"):
+        artist = artist[:-len(" - Topic")]
+    year = info.get('release_year') or (info.get('upload_date') or "")[:4]
+    return {
+        'title': info.get('track') or info.get('title'),
+        'artist': artist or None,
+        'album': info.get('album'),
+        'track': info.get('track_number'),
+        'date': str(year) if year else None,
+        'cover': info.get('thumbnail'),
+    }
+
+def merge_tags(primary, fallback):
+    # primary's values where set (e.g. Spotify's), fallback's for the rest
+    primary, fallback = primary or {}, fallback or {}
+    merged = {key: primary.get(key) or fallback.get(key) for key in set(primary) | set(fallback)}
+    return {key: value for key, value in merged.items() if value}
+
+class ArtworkCache:
+    """Cover images fetched once, resized once, shared by every file using them.
+
+    Files are stored under `directory` as <sha1 of the resized JPEG>.jpg, so
+    the same picture behind different URLs is kept once; the URL -> hash
+    mapping lives in cache.db. Tracks of one album asking for its cover at
+    the same time wait for a single fetch instead of each making their own.
+    """
+
+    def __init__(self, cache=None, directory=ARTWORK_DIR, size=ARTWORK_SIZE, ttl=ARTWORK_TTL):
+        self.directory = directory
+        self.size = size
+        self.ttl = ttl
+        self.cache = cache if cache is not None else DiskCache("artwork_cache", ttl=ttl)
+        self.hits = 0
+        self.fetches = 0
+        self._lock = threading.Lock()
+        self._fetching = {}  # url -> lock held while it is being fetched
+
+    @classmethod
+    def from_config(cls, config, **kwargs):
+        return cls(size=config.get("artwork_size", ARTWORK_SIZE), **kwargs)
+
+    def path(self, digest):
+        return os.path.join(self.directory, digest + ".jpg")
+
+    def get(self, url):
+        # Path of the resized cover for an image URL, None if it can't be had
+        if not url:
+            return None
+        with self._lock:
+            url_lock = self._fetching.setdefault(url, threading.Lock())
+        try:
+            with url_lock:
+                digest = self.cache.get(url)
+                if digest and os.path.exists(self.path(digest)):
+                    with self._lock:
+                        self.hits += 1
+                    return self.path(digest)
+                return self._fetch(url)
+        except Exception as e:
+            print(f"Artwork Error: {url}: {e}")
+            return None
+        finally:
+            with self._lock:
+                self._fetching.pop(url, None)
+
+    def _fetch(self, url):
+        import requests
+        os.makedirs(self.directory, exist_ok=True)
+        name = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        raw = os.path.join(self.directory, name + ".part")
+        resized = os.path.join(self.directory, name + ".tmp.jpg")
+        try:
+            response = requests.get(url, timeout=30)
+            response.raise_for_status()
+            with open(raw, "wb") as f:
+                f.write(response.content)
+            with self._lock:
+                self.fetches += 1
+            # JPEG at most `size` on its longest side, whatever came in (webp thumbnails too)
+            run_ffmpeg(["-i", raw, "-vf", f"scale='min({self.size},iw)':'min({self.size},ih)'"
+                        ":force_original_aspect_ratio=decrease", "-frames:v", "1", "-q:v", "3", resized])
+            with open(resized, "rb") as f:
+                digest = hashlib.sha1(f.read()).hexdigest()
+            os.replace(resized, self.path(digest))
+        finally:
+            for leftover in (raw, resized):
+                if os.path.exists(leftover):
+                    os.remove(leftover)
+        self.cache.set(url, digest, ttl=self.ttl)
+        return self.path(digest)
+
+    def close(self):
+        self.cache.close()